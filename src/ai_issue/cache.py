@@ -0,0 +1,149 @@
+"""Кэш сгенерированного содержимого issue между запусками."""
+
+import hashlib
+import logging
+import math
+import os
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+logger = logging.getLogger(__name__)
+SEMANTIC_CACHE_SIZE = 50
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    """Косинусное сходство двух векторов.
+
+    :param a: Первый вектор
+    :param b: Второй вектор
+    :return: Значение от -1 до 1 (0, если один из векторов нулевой)
+    """
+    norm = math.sqrt(math.fsum(x * x for x in a)) * math.sqrt(math.fsum(y * y for y in b))
+    if not norm:
+        return 0.0
+    return math.fsum(x * y for x, y in zip(a, b, strict=True)) / norm
+
+
+class ResponseCache:
+    """Кэш в JSON-файле.
+
+    Хранит содержимое issue, сгенерированное OpenAI, по хэшу запроса
+    и по эмбеддингу PR для поиска похожих запросов.
+    """
+
+    def __init__(self, path: Path | None = None):
+        """Инициализация кэша.
+
+        :param path: Путь к файлу кэша; если не указан, кэш живет только в памяти
+        """
+        self.path = path
+        self._issues: dict[str, dict[str, Any]] = {}
+        self._semantic: dict[str, list[dict[str, Any]]] = {}
+        self._dirty = False
+
+        if path is not None and path.exists():
+            try:
+                data = orjson.loads(path.read_bytes())
+                self._issues = data.get("issues", {})
+                self._semantic = data.get("semantic", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось прочитать кэш {path}: {e}")
+
+    @classmethod
+    def from_environment(cls) -> "ResponseCache":
+        """Создать кэш по пути из переменных окружения.
+
+        Используется INPUT_CACHE_PATH. Без него кэш живет только в памяти: action запускается
+        в Docker-контейнере, и файл в RUNNER_TEMP все равно не пережил бы запуск.
+
+        :return: Объект ResponseCache
+        """
+        cache_path = os.environ.get("INPUT_CACHE_PATH")
+        return cls(Path(cache_path) if cache_path else None)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Построить ключ кэша из частей запроса.
+
+        :param parts: Части, однозначно определяющие запрос
+        :return: SHA-256 хэш частей
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_issue(self, key: str) -> dict[str, Any] | None:
+        """Получить сохраненное содержимое issue.
+
+        :param key: Ключ запроса к OpenAI
+        :return: Сериализованный IssueContent или None
+        """
+        return self._issues.get(key)
+
+    def set_issue(self, key: str, content: dict[str, Any]) -> None:
+        """Сохранить сгенерированное содержимое issue.
+
+        :param key: Ключ запроса к OpenAI
+        :param content: Сериализованный IssueContent
+        """
+        self._issues[key] = content
+        self._dirty = True
+
+    def find_similar(self, namespace: str, embedding: list[float], threshold: float) -> dict[str, Any] | None:
+        """Найти содержимое issue для самого похожего запроса.
+
+        :param namespace: Пространство имен (репозиторий)
+        :param embedding: Эмбеддинг текущего запроса
+        :param threshold: Минимальное косинусное сходство
+        :return: Сериализованный IssueContent или None
+        """
+        best: dict[str, Any] | None = None
+        best_score = threshold
+        for entry in self._semantic.get(namespace, []):
+            if len(entry["embedding"]) != len(embedding):
+                continue
+            score = cosine_similarity(entry["embedding"], embedding)
+            if score >= best_score:
+                best, best_score = entry["content"], score
+        return best
+
+    def may_find_similar(self, namespace: str) -> bool:
+        """Может ли семантический кэш найти похожий запрос сейчас или в следующих запусках.
+
+        Кэш без файла живет только в памяти: пока в нем нет записей пространства имен,
+        эмбеддинг запроса не пригодится ни для поиска, ни для сохранения.
+
+        :param namespace: Пространство имен (репозиторий)
+        :return: True, если эмбеддинг запроса стоит получать
+        """
+        return self.path is not None or bool(self._semantic.get(namespace))
+
+    def add_similar(self, namespace: str, embedding: list[float], content: dict[str, Any]) -> None:
+        """Сохранить содержимое issue вместе с эмбеддингом запроса.
+
+        Хранится не больше SEMANTIC_CACHE_SIZE последних записей на пространство имен.
+
+        :param namespace: Пространство имен (репозиторий)
+        :param embedding: Эмбеддинг запроса
+        :param content: Сериализованный IssueContent
+        """
+        entries = self._semantic.setdefault(namespace, [])
+        entries.append({"embedding": embedding, "content": content})
+        del entries[:-SEMANTIC_CACHE_SIZE]
+        self._dirty = True
+
+    def save(self) -> None:
+        """Записать кэш в файл, если он изменился."""
+        if self.path is None or not self._dirty:
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_bytes(orjson.dumps({"issues": self._issues, "semantic": self._semantic}))
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш {self.path}: {e}")
@@ -1,124 +1,704 @@
 """Генератор GitHub Issue на основе Pull Request с использованием AI."""
 
+import asyncio
+import functools
 import logging
+import re
+import string
+from collections.abc import Callable
+from types import TracebackType
+from typing import Any, NamedTuple, Self
 
-from github import Github
-from github.Issue import Issue
-from github.NamedUser import NamedUser
-from openai import OpenAI
+import httpx
+import orjson
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from pydantic_core import from_json
 
-from .models import IssueContent, PRInfo
+from .cache import ResponseCache
+from .models import BatchIssueContent, IssueContent, PRInfo
+from .throttle import Throttle
 
 logger = logging.getLogger(__name__)
-NEXT_LINE = "\n"
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_API_VERSION = "2022-11-28"
+# Таймаут OpenAI по умолчанию рассчитан на долгую генерацию, для GitHub API он слишком велик
+GITHUB_TIMEOUT = httpx.Timeout(30.0)
+GITHUB_PAGE_SIZE = 100
+# Повторы только при установке соединения: запрос на сервер еще не ушел, поэтому повтор безопасен и для POST
+HTTP_CONNECT_RETRIES = 2
+MAX_DIFF_CHARS = 12_000
+OPENAI_MODEL = "gpt-5"
+OPENAI_FAST_MODEL = "gpt-5-mini"
+# Потолок ответа на случай, если модель зациклится. В него входят и токены рассуждения,
+# поэтому он намного больше самого issue (сотни токенов)
+OPENAI_MAX_OUTPUT_TOKENS = 8_000
+OPENAI_TITLE_MAX_OUTPUT_TOKENS = 2_000
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 256
+SEMANTIC_CACHE_THRESHOLD = 0.92
+OPENAI_INSTRUCTIONS = "Ты - опытный разработчик, создающий четкие и информативные GitHub issue."
+ISSUE_BODY_PLACEHOLDER = "_Описание issue генерируется..._"
+
+PULL_REQUEST_TEMPLATE = string.Template("""\
+Информация о Pull Request:
+- Заголовок: $title
+- Описание: $body
+- Автор: $author
+- Изменено файлов: $files_changed
+- Добавлено строк: $additions
+- Удалено строк: $deletions
+
+Изменения в PR (unified diff, может быть обрезан):
+$diff""")
+
+TASK_TEMPLATE = string.Template("""\
+Доступные метки issue в репозитории:
+$labels
+
+Доступные типы issue в репозитории:
+$issue_types
+
+Создай:
+1. Краткий и информативный заголовок для issue
+2. Подробное описание проблемы или задачи, которую решает этот PR
+3. Выбери подходящие метки из списка доступных
+4. Выбери подходящий тип issue из списка доступных
+
+Описание должно быть структурированным и включать:
+- Контекст проблемы
+- Почему это важно
+""")
+
+PROMPT_TEMPLATE = string.Template("""\
+На основе следующего Pull Request создай описание issue, которое должно быть решено этим PR.
+
+$pull_request
+
+$task""")
+
+BATCH_PROMPT_TEMPLATE = string.Template("""\
+Для каждого из следующих Pull Request создай описание issue, которое должно быть решено этим PR.
+Верни ровно $count issue: по одному на каждый Pull Request, в том же порядке.
+
+$pull_requests
+
+$task""")
+DEFAULT_BATCH_SIZE = 5
+
+LABELS_FRAGMENT = f"""
+labels(first: {GITHUB_PAGE_SIZE}, after: $cursor) {{
+  nodes {{ name description }}
+  pageInfo {{ hasNextPage endCursor }}
+}}
+"""
+
+REPOSITORY_VIEW_QUERY = f"""
+query($owner: String!, $name: String!, $number: Int!, $cursor: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequest(number: $number) {{
+      title
+      body
+      author {{ login }}
+      createdAt
+      changedFiles
+      additions
+      deletions
+      assignees(first: {GITHUB_PAGE_SIZE}) {{ nodes {{ login }} }}
+    }}
+    {LABELS_FRAGMENT}
+    owner {{
+      ... on Organization {{
+        issueTypes(first: {GITHUB_PAGE_SIZE}) {{ nodes {{ name description }} }}
+      }}
+    }}
+  }}
+}}
+"""
+
+LABELS_QUERY = f"""
+query($owner: String!, $name: String!, $cursor: String) {{
+  repository(owner: $owner, name: $name) {{
+    {LABELS_FRAGMENT}
+  }}
+}}
+"""
+
+
+# Метки, которые в репозиториях без типов issue обычно играют их роль
+COMMON_ISSUE_TYPES = frozenset(
+    {
+        "bug",
+        "bugfix",
+        "fix",
+        "hotfix",
+        "feature",
+        "enhancement",
+        "improvement",
+        "task",
+        "chore",
+        "maintenance",
+        "refactor",
+        "refactoring",
+        "performance",
+        "security",
+        "documentation",
+        "docs",
+        "test",
+        "tests",
+        "question",
+        "epic",
+        "story",
+    }
+)
+TYPE_LABEL_PREFIXES = ("type:", "kind/")
+# Название типа целым словом: "critical-bug" подходит, а "wontfix" нет
+COMMON_ISSUE_TYPES_RE = re.compile(rf"\b(?:{'|'.join(map(re.escape, sorted(COMMON_ISSUE_TYPES)))})s?\b")
+
+
+class RepositoryView(NamedTuple):
+    """Данные PR и репозитория, нужные для генерации issue."""
+
+    pr_info: PRInfo
+    labels: list[tuple[str, str | None]]
+    issue_types: list[tuple[str, str | None]]
+    # Типы issue взяты из меток: выбранный тип ставится меткой, а не полем type
+    issue_types_are_labels: bool = False
+
+
+def issue_types_from_labels(labels: list[tuple[str, str | None]]) -> list[tuple[str, str | None]]:
+    """Выбрать метки, которые можно использовать как типы issue.
+
+    Сначала ищутся точные совпадения с COMMON_ISSUE_TYPES и метки с префиксами
+    TYPE_LABEL_PREFIXES, а если таких нет — метки, содержащие название типа отдельным словом.
+
+    :param labels: Метки репозитория (название и описание)
+    :return: Метки, подходящие на роль типов issue
+    """
+    names = [name.lower() for name, _ in labels]
+    # Есть ли строгие совпадения, решает сравнение множеств без перебора меток по одной
+    if COMMON_ISSUE_TYPES.isdisjoint(names) and not any(name.startswith(TYPE_LABEL_PREFIXES) for name in names):
+        return [label for label, name in zip(labels, names, strict=True) if COMMON_ISSUE_TYPES_RE.search(name)]
+
+    return [
+        label
+        for label, name in zip(labels, names, strict=True)
+        if name in COMMON_ISSUE_TYPES or name.startswith(TYPE_LABEL_PREFIXES)
+    ]
+
+
+def restrict_to_available(
+    issue_content: IssueContent,
+    available_labels: list[tuple[str, str | None]],
+    available_types: list[tuple[str, str | None]],
+) -> IssueContent:
+    """Убрать из содержимого issue метки и тип, которых нет в репозитории, и повторы меток.
+
+    Модель иногда придумывает метки и типы, а GitHub отклоняет неизвестный тип
+    и молча создает неизвестные метки.
+
+    :param issue_content: Сгенерированное содержимое issue
+    :param available_labels: Доступные метки
+    :param available_types: Доступные типы issue
+    :return: Содержимое issue только с доступными метками и типом
+    """
+    label_names = {name for name, _ in available_labels}
+    # dict.fromkeys убирает повторы, сохраняя порядок меток
+    labels = [label for label in dict.fromkeys(issue_content.labels) if label in label_names]
+    issue_type = issue_content.issue_type
+    if issue_type is not None and issue_type not in {name for name, _ in available_types}:
+        issue_type = None
+
+    if labels == issue_content.labels and issue_type == issue_content.issue_type:
+        return issue_content
+    return issue_content.model_copy(update={"labels": labels, "issue_type": issue_type})
+
+
+@functools.cache
+def closing_reference_re(issue_number: int) -> re.Pattern[str]:
+    """Регулярное выражение для закрывающей ссылки на issue этого репозитория (например, "Fixes #456").
+
+    Простое вхождение #456 ссылкой не считается: это может быть цвет #456abc, ссылка на issue
+    другого репозитория other/repo#456 или упоминание без ключевого слова, которое не закроет issue.
+
+    :param issue_number: Номер issue
+    :return: Скомпилированное регулярное выражение
+    """
+    return re.compile(
+        rf"(?<![\w/])(?:close[sd]?|fix(?:e[sd])?|resolve[sd]?):?\s+#{issue_number}(?![\w/])",
+        re.IGNORECASE,
+    )
+
+
+@functools.cache
+def format_options(options: tuple[tuple[str, str | None], ...]) -> str:
+    """Отформатировать метки или типы issue для промпта.
+
+    Пустые описания пропускаются, чтобы не тратить токены на "None".
+    Списки одинаковы для всех PR репозитория, поэтому результат кэшируется.
+
+    :param options: Пары названия и описания
+    :return: Список в markdown, по строке на название и описание
+    """
+    return "\n".join(f"- {name}" + (f"\n  — {desc}" if desc else "") for name, desc in options)
+
+
+def render_pull_request(pr_info: PRInfo, pr_diff: str) -> str:
+    """Описать PR для промпта.
+
+    :param pr_info: Информация о PR
+    :param pr_diff: Diff PR (может быть обрезан)
+    :return: Блок промпта с информацией о PR и его diff
+    """
+    return PULL_REQUEST_TEMPLATE.substitute(
+        title=pr_info.title,
+        body=pr_info.body,
+        author=pr_info.author,
+        files_changed=pr_info.files_changed,
+        additions=pr_info.additions,
+        deletions=pr_info.deletions,
+        diff=pr_diff or "diff недоступен",
+    )
+
+
+def render_task(available_labels: list[tuple[str, str | None]], available_types: list[tuple[str, str | None]]) -> str:
+    """Описать задачу для модели вместе с доступными метками и типами.
+
+    :param available_labels: Доступные метки
+    :param available_types: Доступные типы issue
+    :return: Блок промпта с метками, типами и требованиями к issue
+    """
+    return TASK_TEMPLATE.substitute(
+        labels=format_options(tuple(available_labels)) or "нет доступных меток",
+        issue_types=format_options(tuple(available_types)) or "нет доступных типов",
+    )
 
 
 class AIIssueGenerator:
     """Класс для генерации и создания GitHub Issue на основе PR."""
 
-    def __init__(self, github_token: str, openai_api_key: str, repository: str, pr_number: int):
+    def __init__(
+        self,
+        github_token: str,
+        openai_api_key: str,
+        repository: str,
+        pr_number: int,
+        cache: ResponseCache | None = None,
+    ):
         """Инициализация генератора issue.
 
         :param github_token: Токен для доступа к GitHub API
         :param openai_api_key: API ключ OpenAI
         :param repository: Полное имя репозитория (owner/repo)
         :param pr_number: Номер Pull Request
+        :param cache: Кэш сгенерированного содержимого issue между запусками
         """
-        self.github = Github(github_token)
-        self.openai = OpenAI(api_key=openai_api_key)
+        # Один HTTP-клиент на GitHub и OpenAI: общий пул соединений и SSL-контекст.
+        # Поэтому у клиента нет base_url и авторизации, они передаются в каждом запросе к GitHub
+        self._http = DefaultAsyncHttpxClient(
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=10),
+                retries=HTTP_CONNECT_RETRIES,
+            ),
+        )
+        self._github_headers = {
+            "Authorization": f"Bearer {github_token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": GITHUB_API_VERSION,
+        }
+        self.openai = AsyncOpenAI(api_key=openai_api_key, http_client=self._http)
         self.repository = repository
         self.pr_number = pr_number
-        self.repo = self.github.get_repo(repository)
-        self.pr = self.repo.get_pull(pr_number)
+        self.cache = cache or ResponseCache()
+        self._repository_view: asyncio.Future[RepositoryView] | None = None
+        self._throttle = Throttle()
+        self._background_tasks: list[asyncio.Task[None]] = []
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        try:
+            # Фоновые запросы должны завершиться до закрытия клиента.
+            # Если выход вызван ошибкой, их ошибки не подменяют исходную
+            await asyncio.gather(*self._background_tasks, return_exceptions=exc is not None)
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент GitHub API и OpenAI."""
+        await self._http.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        json: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        """Выполнить запрос к GitHub API и проверить статус ответа.
+
+        :param method: HTTP-метод
+        :param url: Путь относительно GitHub API
+        :param json: Тело запроса
+        :param headers: Дополнительные заголовки запроса
+        :return: Ответ GitHub API
+        """
+        headers = {**self._github_headers, **(headers or {})}
+        if json is not None:
+            headers["Content-Type"] = "application/json"
+        async with self._throttle:
+            response = await self._http.request(
+                method,
+                f"{GITHUB_API_URL}{url}",
+                content=orjson.dumps(json) if json is not None else None,
+                headers=headers,
+                timeout=GITHUB_TIMEOUT,
+            )
+        self._throttle.update(response)
+        response.raise_for_status()
+        return response
+
+    async def _graphql(
+        self,
+        query: str,
+        variables: dict[str, Any],
+        optional_paths: tuple[tuple[str, ...], ...] = (),
+    ) -> dict[str, Any]:
+        """Выполнить запрос к GitHub GraphQL API.
+
+        :param query: Текст запроса GraphQL
+        :param variables: Переменные запроса
+        :param optional_paths: Пути полей, ошибки в которых не прерывают запрос: такие поля приходят null
+        :return: Поле data ответа
+        """
+        response = await self._request("POST", "/graphql", json={"query": query, "variables": variables})
+        result = orjson.loads(response.content)
+        errors = result.get("errors") or []
+        fatal = [
+            error
+            for error in errors
+            if result.get("data") is None
+            or not any(tuple(error.get("path") or ())[: len(path)] == path for path in optional_paths)
+        ]
+        if fatal:
+            raise RuntimeError(f"Ошибка GitHub GraphQL API: {'; '.join(error['message'] for error in fatal)}")
+        for error in errors:
+            logger.warning(f"Поле {'.'.join(map(str, error['path']))} недоступно: {error['message']}")
+        data: dict[str, Any] = result["data"]
+        return data
+
+    def _get_repository_view(self) -> asyncio.Future[RepositoryView]:
+        """Получить PR, метки и типы issue одним запросом GraphQL.
+
+        Запрос выполняется один раз на время жизни генератора,
+        get_pr_info, get_available_labels и get_available_issue_types ожидают его общий результат.
+        Запоминается только успешный результат: после ошибки следующий вызов повторяет запрос.
+
+        :return: Задача с PR, метками и типами issue
+        """
+        view = self._repository_view
+        failed = view is not None and view.done() and (view.cancelled() or view.exception() is not None)
+        if view is None or failed:
+            view = self._repository_view = asyncio.ensure_future(self._fetch_repository_view())
+        return view
+
+    async def _fetch_repository_view(self) -> RepositoryView:
+        """Загрузить PR, метки и типы issue из GitHub GraphQL API.
+
+        :return: Информация о PR, метки и типы issue
+        """
+        owner, name = self.repository.split("/", 1)
+        data = await self._graphql(
+            REPOSITORY_VIEW_QUERY,
+            {"owner": owner, "name": name, "number": self.pr_number},
+            # Без доступа к типам issue организации (например, у токена нет прав) используем метки
+            optional_paths=(("repository", "owner", "issueTypes"),),
+        )
+        repository = data["repository"]
+        pr = repository["pullRequest"]
+
+        labels = repository["labels"]
+        label_nodes = list(labels["nodes"])
+        # Метки сверх первой страницы есть только в больших репозиториях
+        while labels["pageInfo"]["hasNextPage"]:
+            data = await self._graphql(
+                LABELS_QUERY,
+                {"owner": owner, "name": name, "cursor": labels["pageInfo"]["endCursor"]},
+            )
+            labels = data["repository"]["labels"]
+            label_nodes.extend(labels["nodes"])
+
+        # Типы issue есть только у организаций, для пользователя owner приходит без issueTypes
+        type_nodes = (repository["owner"].get("issueTypes") or {"nodes": []})["nodes"]
+        labels_list = [(label["name"], label["description"]) for label in label_nodes]
+        issue_types = [(issue_type["name"], issue_type["description"]) for issue_type in type_nodes]
+
+        # Типы полей гарантирует схема GraphQL, повторная валидация не нужна
+        pr_info = PRInfo.model_construct(
+            title=pr["title"],
+            body=pr["body"] or "",
+            assignees=[assignee["login"] for assignee in pr["assignees"]["nodes"]],
+            author=(pr["author"] or {}).get("login", "ghost"),
+            created_at=pr["createdAt"],
+            files_changed=pr["changedFiles"],
+            additions=pr["additions"],
+            deletions=pr["deletions"],
+        )
+        if issue_types:
+            return RepositoryView(pr_info=pr_info, labels=labels_list, issue_types=issue_types)
+
+        logger.info("Типы issue в репозитории не настроены, используем подходящие метки")
+        return RepositoryView(
+            pr_info=pr_info,
+            labels=labels_list,
+            issue_types=issue_types_from_labels(labels_list),
+            issue_types_are_labels=True,
+        )
 
-    def get_available_labels(self) -> list[tuple[str, str]]:
+    async def get_available_labels(self) -> list[tuple[str, str | None]]:
         """Получить список доступных меток в репозитории.
 
         :return: Список названий и описаний меток
         """
-        labels = self.repo.get_labels()
-        return [(label.name, label.description) for label in labels]
+        return (await self._get_repository_view()).labels
 
-    def get_available_issue_types(self) -> list[tuple[str, str]]:
+    async def get_available_issue_types(self) -> list[tuple[str, str | None]]:
         """Получить список доступных типов Issue.
 
         :return: Список названий и описаний типов
         """
-        _, data = self.github.requester.requestJsonAndCheck("GET", f"/orgs/{self.repo.organization.login}/issue-types")
-        return [(t.get("name"), t.get("description")) for t in data]
+        return (await self._get_repository_view()).issue_types
 
-    def get_pr_info(self) -> PRInfo:
+    async def get_pr_info(self) -> PRInfo:
         """Получить информацию о Pull Request.
 
         :return: Объект PRInfo с информацией о PR
         """
-        return PRInfo(
-            title=self.pr.title,
-            body=self.pr.body or "",
-            assignees=self.pr.assignees,
-            author=self.pr.user.login,
-            created_at=self.pr.created_at.isoformat(),
-            files_changed=self.pr.changed_files,
-            additions=self.pr.additions,
-            deletions=self.pr.deletions,
-        )
+        return (await self._get_repository_view()).pr_info
+
+    async def get_pr_diff(self) -> str:
+        """Получить diff Pull Request, обрезанный до MAX_DIFF_CHARS символов.
+
+        Ответ читается потоком и не скачивается дальше нужного объема.
+        Diff лишь дополняет промпт, поэтому если он недоступен (например, слишком большой PR
+        или оборвалось соединение), возвращается пустая строка.
 
-    def generate_issue_content(
+        :return: Начало unified diff PR
+        """
+        url = f"{GITHUB_API_URL}/repos/{self.repository}/pulls/{self.pr_number}"
+        headers = {**self._github_headers, "Accept": "application/vnd.github.diff"}
+        chunks: list[str] = []
+        size = 0
+
+        try:
+            async with (
+                self._throttle,
+                self._http.stream("GET", url, headers=headers, timeout=GITHUB_TIMEOUT) as response,
+            ):
+                self._throttle.update(response)
+                response.raise_for_status()
+                async for chunk in response.aiter_text():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= MAX_DIFF_CHARS:
+                        break
+        except httpx.HTTPError as e:
+            logger.warning(f"Не удалось получить diff PR: {e}")
+            return ""
+
+        return "".join(chunks)[:MAX_DIFF_CHARS]
+
+    async def generate_issue_content(
         self,
         pr_info: PRInfo,
-        available_labels: list[tuple[str, str]],
-        available_types: list[tuple[str, str]],
+        available_labels: list[tuple[str, str | None]],
+        available_types: list[tuple[str, str | None]],
+        pr_diff: str = "",
+        on_title: Callable[[str], None] | None = None,
     ) -> IssueContent:
         """Генерировать содержимое issue с помощью OpenAI.
 
+        Ответ модели читается потоком: как только заголовок сгенерирован полностью,
+        вызывается on_title, не дожидаясь описания, меток и типа.
+        Для содержимого из кэша on_title не вызывается.
+
         :param pr_info: Информация о PR
         :param available_labels: Доступные метки
         :param available_types: Доступные типы issue
+        :param pr_diff: Diff PR (может быть обрезан)
+        :param on_title: Обработчик готового заголовка issue
         :return: Объект IssueContent с сгенерированным содержимым
         """
-        prompt = f"""
-        На основе следующего Pull Request создай описание issue, которое должно быть решено этим PR.
+        prompt = PROMPT_TEMPLATE.substitute(
+            pull_request=render_pull_request(pr_info, pr_diff),
+            task=render_task(available_labels, available_types),
+        )
 
-        Информация о Pull Request:
-        - Заголовок: {pr_info.title}
-        - Описание: {pr_info.body}
-        - Автор: {pr_info.author}
-        - Изменено файлов: {pr_info.files_changed}
-        - Добавлено строк: {pr_info.additions}
-        - Удалено строк: {pr_info.deletions}
+        # Повторный запуск для того же PR не должен заново обращаться к OpenAI
+        cache_key = ResponseCache.make_key(OPENAI_MODEL, OPENAI_INSTRUCTIONS, prompt)
+        if cached := self.cache.get_issue(cache_key):
+            logger.info("Содержимое issue взято из кэша")
+            return IssueContent.model_validate(cached)
+
+        # Для похожего PR берем issue из кэша и генерируем быстрой моделью только заголовок.
+        # В эмбеддинг попадает только текст PR: списки меток одинаковы для всего репозитория.
+        # Если кэшу некуда сохранить эмбеддинг и искать не в чем, лишний запрос перед генерацией не нужен
+        embedding = None
+        if self.cache.may_find_similar(self.repository):
+            embedding = await self._embed(f"{pr_info.title}\n{pr_info.body}\n{pr_diff}")
+        if embedding and (similar := self.cache.find_similar(self.repository, embedding, SEMANTIC_CACHE_THRESHOLD)):
+            logger.info("Найдено похожее issue в кэше, генерируем только заголовок")
+            issue_content = IssueContent.model_validate(similar)
+            # Рассуждающая модель может упереться в лимит токенов и вернуть пустой ответ:
+            # такой заголовок GitHub отклонит, а из кэша он ломал бы и повторные запуски
+            if title := await self._generate_title(pr_info):
+                issue_content.title = title
+                self.cache.set_issue(cache_key, issue_content.model_dump())
+            else:
+                logger.warning("Быстрая модель вернула пустой заголовок, оставляем заголовок похожего issue")
+            return issue_content
 
-        Доступные метки issue в репозитории:
-        {NEXT_LINE.join(f"- {title}{NEXT_LINE}Описание метки: {desc}" for title, desc in available_labels)}
+        try:
+            async with self.openai.responses.stream(
+                model=OPENAI_MODEL,
+                instructions=OPENAI_INSTRUCTIONS,
+                input=prompt,
+                text_format=IssueContent,
+                temperature=0.7,
+                max_output_tokens=OPENAI_MAX_OUTPUT_TOKENS,
+            ) as stream:
+                title_pending = on_title is not None
+                async for event in stream:
+                    if title_pending and event.type == "response.output_text.delta":
+                        # Незавершенная строка в конце частичного JSON отбрасывается,
+                        # поэтому title появляется в разборе только целиком
+                        partial = from_json(event.snapshot, allow_partial=True)
+                        if isinstance(partial, dict) and partial.get("title"):
+                            assert on_title is not None
+                            on_title(partial["title"])
+                            title_pending = False
+                response = await stream.get_final_response()
+            assert response.output_parsed is not None
+            # Ответ уже проверен SDK по схеме IssueContent, сериализуем его для кэша один раз
+            content = response.output_parsed.model_dump()
+            self.cache.set_issue(cache_key, content)
+            if embedding:
+                self.cache.add_similar(self.repository, embedding, content)
+            return response.output_parsed
+        except Exception as e:
+            logger.error(f"Ошибка при генерации содержимого issue: {e}")
+            raise
 
-        Доступные типы issue в репозитории:
-        {NEXT_LINE.join(f"- {title}{NEXT_LINE}Описание типа: {desc}" for title, desc in available_types)}
+    async def generate_issues_batched(
+        self,
+        prs: list[PRInfo],
+        available_labels: list[tuple[str, str | None]],
+        available_types: list[tuple[str, str | None]],
+        pr_diffs: list[str] | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> list[IssueContent]:
+        """Генерировать содержимое issue для нескольких PR одного репозитория.
+
+        PR отправляются в OpenAI пачками по batch_size в одном запросе, пачки обрабатываются параллельно.
+        Один PR генерируется обычным generate_issue_content, с кэшем и потоковым ответом.
+
+        :param prs: Информация о PR
+        :param available_labels: Доступные метки
+        :param available_types: Доступные типы issue
+        :param pr_diffs: Diff каждого PR (может быть обрезан)
+        :param batch_size: Максимальное число PR в одном запросе
+        :return: Содержимое issue в порядке PR
+        """
+        diffs = pr_diffs or [""] * len(prs)
+        if len(prs) == 1:
+            return [await self.generate_issue_content(prs[0], available_labels, available_types, diffs[0])]
+
+        task = render_task(available_labels, available_types)
+        batches = [
+            (prs[start : start + batch_size], diffs[start : start + batch_size])
+            for start in range(0, len(prs), batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._generate_batch(batch, batch_diffs, task) for batch, batch_diffs in batches)
+        )
+        return [issue_content for batch_result in results for issue_content in batch_result]
 
-        Создай:
-        1. Краткий и информативный заголовок для issue
-        2. Подробное описание проблемы или задачи, которую решает этот PR
-        3. Выбери подходящие метки из списка доступных
-        4. Выбери подходящий тип issue из списка доступных
+    async def _generate_batch(self, prs: list[PRInfo], pr_diffs: list[str], task: str) -> list[IssueContent]:
+        """Генерировать содержимое issue для пачки PR одним запросом к OpenAI.
 
-        Описание должно быть структурированным и включать:
-        - Контекст проблемы
-        - Почему это важно
+        :param prs: Информация о PR
+        :param pr_diffs: Diff каждого PR
+        :param task: Блок промпта с метками, типами и требованиями к issue
+        :return: Содержимое issue в порядке PR
         """
+        prompt = BATCH_PROMPT_TEMPLATE.substitute(
+            count=len(prs),
+            pull_requests="\n\n".join(
+                f"### Pull Request {index}\n{render_pull_request(pr_info, pr_diff)}"
+                for index, (pr_info, pr_diff) in enumerate(zip(prs, pr_diffs, strict=True), start=1)
+            ),
+            task=task,
+        )
 
         try:
-            response = self.openai.responses.parse(
-                model="gpt-5",
-                instructions="Ты - опытный разработчик, создающий четкие и информативные GitHub issue.",
+            response = await self.openai.responses.parse(
+                model=OPENAI_MODEL,
+                instructions=OPENAI_INSTRUCTIONS,
                 input=prompt,
-                text_format=IssueContent,
+                text_format=BatchIssueContent,
                 temperature=0.7,
+                max_output_tokens=OPENAI_MAX_OUTPUT_TOKENS * len(prs),
             )
             assert response.output_parsed is not None
-            return response.output_parsed
+            items = response.output_parsed.items
+            if len(items) != len(prs):
+                raise ValueError(f"OpenAI вернул {len(items)} issue вместо {len(prs)}")
+            return items
         except Exception as e:
-            logger.error(f"Ошибка при генерации содержимого issue: {e}")
+            logger.error(f"Ошибка при пакетной генерации содержимого issue: {e}")
             raise
 
-    def create_issue(self, issue_content: IssueContent, assignees: list[NamedUser]) -> int:
+    async def _embed(self, text: str) -> list[float] | None:
+        """Получить эмбеддинг текста для поиска похожих PR в кэше.
+
+        :param text: Текст PR
+        :return: Вектор эмбеддинга или None, если OpenAI недоступен
+        """
+        try:
+            response = await self.openai.embeddings.create(
+                model=OPENAI_EMBEDDING_MODEL,
+                input=text,
+                dimensions=EMBEDDING_DIMENSIONS,
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logger.warning(f"Не удалось получить эмбеддинг PR, семантический кэш пропущен: {e}")
+            return None
+
+    async def _generate_title(self, pr_info: PRInfo) -> str:
+        """Сгенерировать заголовок issue быстрой моделью.
+
+        :param pr_info: Информация о PR
+        :return: Заголовок issue
+        """
+        response = await self.openai.responses.create(
+            model=OPENAI_FAST_MODEL,
+            instructions=OPENAI_INSTRUCTIONS,
+            input=(
+                "Придумай краткий и информативный заголовок issue, которое решает этот Pull Request. "
+                f"Ответь только заголовком.\n\nЗаголовок PR: {pr_info.title}\nОписание PR: {pr_info.body}"
+            ),
+            max_output_tokens=OPENAI_TITLE_MAX_OUTPUT_TOKENS,
+        )
+        return response.output_text.strip()
+
+    async def create_issue(self, issue_content: IssueContent, assignees: list[str]) -> int:
         """Создать issue в GitHub.
 
         :param issue_content: Содержимое issue
@@ -127,62 +707,147 @@ class AIIssueGenerator:
         """
         try:
             # Создаем issue
-            headers, data = self.github.requester.requestJsonAndCheck(
+            response = await self._request(
                 "POST",
-                f"{self.repo.url}/issues",
-                input={
+                f"/repos/{self.repository}/issues",
+                json={
                     "title": issue_content.title,
                     "body": issue_content.body,
                     "labels": issue_content.labels,
                     "type": issue_content.issue_type,
-                    "assignees": [element.login for element in assignees],
+                    "assignees": assignees,
                 },
             )
-            issue = Issue(self.github.requester, headers, data, completed=True)
+            issue_number: int = orjson.loads(response.content)["number"]
 
-            logger.info(f"Issue #{issue.number} успешно создан")
-            return issue.number
+            logger.info(f"Issue #{issue_number} успешно создан")
+            return issue_number
 
         except Exception as e:
             logger.error(f"Ошибка при создании issue: {e}")
             raise
 
-    def update_pr_description(self, issue_number: int) -> None:
+    async def update_issue(self, issue_number: int, issue_content: IssueContent) -> None:
+        """Обновить содержимое созданного issue.
+
+        :param issue_number: Номер issue
+        :param issue_content: Содержимое issue
+        """
+        try:
+            await self._request(
+                "PATCH",
+                f"/repos/{self.repository}/issues/{issue_number}",
+                json={
+                    "title": issue_content.title,
+                    "body": issue_content.body,
+                    "labels": issue_content.labels,
+                    "type": issue_content.issue_type,
+                },
+            )
+            logger.info(f"Содержимое issue #{issue_number} обновлено")
+
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении issue: {e}")
+            raise
+
+    async def close_issue(self, issue_number: int) -> None:
+        """Закрыть issue как незапланированное.
+
+        :param issue_number: Номер issue
+        """
+        await self._request(
+            "PATCH",
+            f"/repos/{self.repository}/issues/{issue_number}",
+            json={"state": "closed", "state_reason": "not_planned"},
+        )
+        logger.info(f"Issue #{issue_number} закрыт")
+
+    async def update_pr_description(self, issue_number: int, current_body: str) -> None:
         """Обновить описание PR, добавив ссылку на созданное issue.
 
         :param issue_number: Номер созданного issue
+        :param current_body: Текущее описание PR
         """
+        if closing_reference_re(issue_number).search(current_body):
+            logger.info(f"Описание PR уже закрывает issue #{issue_number}")
+            return
+
         try:
-            current_body = self.pr.body or ""
-            new_body = f"{current_body}\n\nCloses #{issue_number}"
+            link = f"Closes #{issue_number}"
+            # У PR без описания ссылка становится всем описанием, без пустых строк в начале
+            new_body = f"{current_body}\n\n{link}" if current_body else link
 
-            self.pr.edit(body=new_body)
+            await self._request("PATCH", f"/repos/{self.repository}/pulls/{self.pr_number}", json={"body": new_body})
             logger.info(f"Описание PR обновлено ссылкой на issue #{issue_number}")
 
         except Exception as e:
             logger.error(f"Ошибка при обновлении описания PR: {e}")
             raise
 
-    def process(self) -> int:
-        """Основной процесс создания issue на основе PR."""
+    async def process(self) -> int:
+        """Основной процесс создания issue на основе PR.
+
+        Описание PR обновляется в фоне: номер issue возвращается, не дожидаясь этого запроса,
+        а сам запрос завершается при выходе из контекста генератора.
+
+        :return: Номер созданного issue
+        """
         try:
             logger.info(f"Начинаем обработку PR #{self.pr_number} в репозитории {self.repository}")
 
-            # Получаем информацию
-            pr_info = self.get_pr_info()
-            available_labels = self.get_available_labels()
-            available_types = self.get_available_issue_types()
+            # Получаем информацию о PR, его diff, метки и типы параллельно
+            view, pr_diff = await asyncio.gather(self._get_repository_view(), self.get_pr_diff())
+            pr_info, available_labels, available_types = view.pr_info, view.labels, view.issue_types
 
-            logger.info("Генерируем содержимое issue с помощью OpenAI...")
-            issue_content = self.generate_issue_content(pr_info, available_labels, available_types)
+            # Issue создается, как только готов заголовок, пока модель дописывает остальное
+            issue_task: asyncio.Task[int] | None = None
 
-            logger.info("Создаем issue в GitHub...")
-            issue_number = self.create_issue(issue_content, pr_info.assignees)
+            def create_issue_early(title: str) -> None:
+                nonlocal issue_task
+                logger.info("Заголовок готов, создаем issue в GitHub...")
+                # Заголовок уже разобран из ответа модели, повторная валидация не нужна
+                placeholder = IssueContent.model_construct(title=title, body=ISSUE_BODY_PLACEHOLDER)
+                issue_task = asyncio.create_task(self.create_issue(placeholder, pr_info.assignees))
 
-            logger.info("Обновляем описание PR...")
-            self.update_pr_description(issue_number)
-
-            logger.info(f"Процесс завершен успешно! Issue #{issue_number} создан и связан с PR #{self.pr_number}")
+            logger.info("Генерируем содержимое issue с помощью OpenAI...")
+            try:
+                issue_content = await self.generate_issue_content(
+                    pr_info, available_labels, available_types, pr_diff, on_title=create_issue_early
+                )
+            except Exception:
+                if issue_task is not None:
+                    await self.close_issue(await issue_task)
+                raise
+
+            issue_content = restrict_to_available(issue_content, available_labels, available_types)
+            if view.issue_types_are_labels and issue_content.issue_type:
+                # Поле type принимает только типы организации, тип из меток ставится меткой
+                labels = list(dict.fromkeys([*issue_content.labels, issue_content.issue_type]))
+                issue_content = issue_content.model_copy(update={"labels": labels, "issue_type": None})
+
+            if issue_task is None:
+                logger.info("Создаем issue в GitHub...")
+                issue_number = await self.create_issue(issue_content, pr_info.assignees)
+            else:
+                issue_number = await issue_task
+
+            # Ссылка Closes #N работает только в описании PR, поэтому PATCH PR остается,
+            # но номер issue уже известен и результат process не ждет этого запроса
+            logger.info("Обновляем описание PR в фоне...")
+            pr_update = asyncio.create_task(self.update_pr_description(issue_number, pr_info.body))
+            self._background_tasks.append(pr_update)
+
+            if issue_task is not None:
+                logger.info("Дополняем issue сгенерированным содержимым...")
+                try:
+                    await self.update_issue(issue_number, issue_content)
+                except Exception:
+                    # Issue с заглушкой вместо описания не должно остаться открытым и связанным с PR
+                    pr_update.cancel()
+                    await self.close_issue(issue_number)
+                    raise
+
+            logger.info(f"Issue #{issue_number} создан для PR #{self.pr_number}")
 
             return issue_number
 
@@ -0,0 +1,78 @@
+"""Чтение события GitHub и запись outputs GitHub Actions.
+
+Модуль не зависит от openai, httpx и pydantic, поэтому импортируется быстро.
+"""
+
+import logging
+import os
+from pathlib import Path
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+def parse_github_event() -> tuple[str, int, str]:
+    """Парсить событие GitHub из переменных окружения.
+
+    Для отредактированного или удаленного комментария comment_body пустой:
+    триггер в нем не ищется, и action завершается без ошибки.
+
+    :return: Кортеж (repository, pr_number, comment_body)
+    :raises ValueError: Если событие не является комментарием к PR
+    """
+    event_path = os.environ.get("GITHUB_EVENT_PATH")
+
+    if not event_path:
+        raise ValueError("GITHUB_EVENT_PATH не найден в переменных окружения")
+
+    # Отсутствие файла обнаруживается при чтении, без отдельного вызова exists()
+    try:
+        event = orjson.loads(Path(event_path).read_bytes())
+    except FileNotFoundError:
+        raise ValueError(f"Файл события не найден: {event_path}") from None
+
+    # Проверяем, что это комментарий к PR
+    if not event.get("issue", {}).get("pull_request"):
+        raise ValueError("Событие не является комментарием к Pull Request")
+
+    repository = event["repository"]["full_name"]
+    pr_number = event["issue"]["number"]
+
+    # Триггер ищется только в новых комментариях: правка не должна создавать еще одно issue
+    action = event.get("action")
+    if action != "created":
+        logger.info(f"Действие с комментарием {action}, а не created: триггер не проверяется")
+        return repository, pr_number, ""
+
+    comment_body = event["comment"]["body"]
+
+    return repository, pr_number, comment_body
+
+
+def set_github_outputs(outputs: dict[str, str]) -> None:
+    """Установить несколько outputs для GitHub Actions.
+
+    Файл GITHUB_OUTPUT открывается один раз на все переменные.
+
+    :param outputs: Имена и значения переменных
+    """
+    github_output = os.environ.get("GITHUB_OUTPUT")
+
+    if github_output:
+        # Новый способ для GitHub Actions
+        with Path(github_output).open("a", encoding="utf-8") as f:
+            f.writelines(f"{name}={value}\n" for name, value in outputs.items())
+    else:
+        # Старый способ (deprecated, но оставляем для совместимости)
+        for name, value in outputs.items():
+            print(f"::set-output name={name}::{value}")
+
+
+def set_github_output(name: str, value: str) -> None:
+    """Установить output для GitHub Actions.
+
+    :param name: Имя переменной
+    :param value: Значение переменной
+    """
+    set_github_outputs({name: value})
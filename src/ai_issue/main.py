@@ -1,76 +1,81 @@
 #!/usr/bin/env python
 """Главный модуль для запуска AI Issue Generator из GitHub Actions."""
 
-import json
+import asyncio
 import logging
 import os
+import re
 import sys
-from pathlib import Path
 
-from .generator import AIIssueGenerator
+from .cache import ResponseCache
+from .github_io import parse_github_event, set_github_output, set_github_outputs
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
+TRIGGER = re.compile("@aiissue", re.IGNORECASE)
 
+__all__ = ["main", "parse_github_event", "process_pr", "set_github_output", "set_github_outputs"]
 
-def parse_github_event() -> tuple[str, int, str]:
-    """Парсить событие GitHub из переменных окружения.
 
-    :return: Кортеж (repository, pr_number, comment_body)
-    :raises ValueError: Если событие не является комментарием к PR
-    """
-    event_path = os.environ.get("GITHUB_EVENT_PATH")
-
-    if not event_path:
-        raise ValueError("GITHUB_EVENT_PATH не найден в переменных окружения")
-
-    event_file = Path(event_path)
-    if not event_file.exists():
-        raise ValueError(f"Файл события не найден: {event_path}")
-
-    with event_file.open("r", encoding="utf-8") as f:
-        event = json.load(f)
-
-    # Проверяем, что это комментарий к PR
-    if not event.get("issue", {}).get("pull_request"):
-        raise ValueError("Событие не является комментарием к Pull Request")
-
-    repository = event["repository"]["full_name"]
-    pr_number = event["issue"]["number"]
-    comment_body = event["comment"]["body"]
+async def process_pr(github_token: str, openai_api_key: str, repository: str, pr_number: int) -> int:
+    """Создать issue на основе PR, записать outputs GitHub Actions и закрыть HTTP-клиенты.
 
-    return repository, pr_number, comment_body
+    Outputs записываются, пока генератор в фоне обновляет описание PR.
 
-
-def set_github_output(name: str, value: str) -> None:
-    """Установить output для GitHub Actions.
-
-    :param name: Имя переменной
-    :param value: Значение переменной
+    :param github_token: Токен для доступа к GitHub API
+    :param openai_api_key: API ключ OpenAI
+    :param repository: Полное имя репозитория (owner/repo)
+    :param pr_number: Номер Pull Request
+    :return: Номер созданного issue
     """
-    github_output = os.environ.get("GITHUB_OUTPUT")
+    # openai, httpx и pydantic импортируются только после проверки триггера:
+    # комментарии без @aiissue не платят за их загрузку
+    from .generator import AIIssueGenerator  # noqa: PLC0415
 
-    if github_output:
-        # Новый способ для GitHub Actions
-        with Path(github_output).open("a", encoding="utf-8") as f:
-            f.write(f"{name}={value}\n")
-    else:
-        # Старый способ (deprecated, но оставляем для совместимости)
-        print(f"::set-output name={name}::{value}")
+    cache = ResponseCache.from_environment()
+    try:
+        async with AIIssueGenerator(
+            github_token=github_token,
+            openai_api_key=openai_api_key,
+            repository=repository,
+            pr_number=pr_number,
+            cache=cache,
+        ) as generator:
+            issue_number = await generator.process()
+
+            # Возвращаем номер issue как output для GitHub Actions
+            set_github_outputs(
+                {
+                    "issue_number": str(issue_number),
+                    "issue_url": f"https://github.com/{repository}/issues/{issue_number}",
+                },
+            )
+            return issue_number
+    finally:
+        # Сохраняем кэш и при ошибке: повторный запуск не будет заново вызывать OpenAI
+        cache.save()
 
 
 def main() -> None:
     """Главная функция для запуска из GitHub Actions."""
+    # Логирование настраивается при запуске, а не при импорте модуля
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        force=True,
+    )
+
     try:
+        # Другие события не читаем вовсе: триггер бывает только в комментариях
+        event_name = os.environ.get("GITHUB_EVENT_NAME", "issue_comment")
+        if event_name != "issue_comment":
+            logger.info(f"Событие {event_name} не является комментарием, пропускаем")
+            sys.exit(0)
+
         # Получаем данные из окружения
         repository, pr_number, comment_body = parse_github_event()
 
         # Проверяем наличие триггера в комментарии
-        if "@aiissue" not in comment_body.lower():
+        if not TRIGGER.search(comment_body):
             logger.info("Комментарий не содержит триггер @aiissue, пропускаем")
             sys.exit(0)
 
@@ -90,19 +95,15 @@ def main() -> None:
             raise ValueError("OpenAI API ключ не найден. Установите OPENAI_API_KEY или передайте openai_api_key")
 
         # Создаем генератор и запускаем процесс
-        generator = AIIssueGenerator(
-            github_token=github_token,
-            openai_api_key=openai_api_key,
-            repository=repository,
-            pr_number=pr_number,
+        issue_number = asyncio.run(
+            process_pr(
+                github_token=github_token,
+                openai_api_key=openai_api_key,
+                repository=repository,
+                pr_number=pr_number,
+            ),
         )
 
-        issue_number = generator.process()
-
-        # Возвращаем номер issue как output для GitHub Actions
-        set_github_output("issue_number", str(issue_number))
-        set_github_output("issue_url", f"https://github.com/{repository}/issues/{issue_number}")
-
         logger.info(f"Issue создан: https://github.com/{repository}/issues/{issue_number}")
 
     except Exception as e:
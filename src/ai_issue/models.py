@@ -1,6 +1,5 @@
 """Модели данных для работы с GitHub и OpenAI API."""
 
-from github.NamedUser import NamedUser
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -16,17 +15,27 @@ class IssueContent(BaseModel):
     issue_type: str | None = Field(description="Тип issue (выбрать один из доступных)", default=None)
 
 
+class BatchIssueContent(BaseModel):
+    """Модель для структурированного вывода OpenAI при пакетной генерации.
+
+    Содержит issue для нескольких PR в порядке их следования в запросе.
+    """
+
+    items: list[IssueContent] = Field(description="Issue для каждого PR в том же порядке")
+
+
 class PRInfo(BaseModel):
     """Информация о Pull Request.
 
-    Содержит основные данные о PR для анализа.
+    Содержит основные данные о PR для анализа. Данные PR не меняются после получения,
+    поэтому модель неизменяема.
     """
 
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    model_config = ConfigDict(frozen=True)
 
     title: str = Field(description="Заголовок PR")
     body: str = Field(description="Описание PR", default="")
-    assignees: list[NamedUser] = Field(description="Список назначенных пользователей", default_factory=list)
+    assignees: list[str] = Field(description="Логины назначенных пользователей", default_factory=list)
     author: str = Field(description="Автор PR")
     created_at: str = Field(description="Дата создания PR")
     files_changed: int = Field(description="Количество измененных файлов")
@@ -0,0 +1,89 @@
+"""Ограничение частоты запросов к GitHub API."""
+
+import asyncio
+import logging
+import time
+from datetime import UTC
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+
+import httpx
+
+logger = logging.getLogger(__name__)
+MAX_CONCURRENT_REQUESTS = 4
+
+
+def parse_retry_after(value: str) -> float | None:
+    """Получить паузу в секундах из заголовка Retry-After.
+
+    Заголовок содержит либо число секунд, либо дату HTTP, после которой можно повторить запрос.
+
+    :param value: Значение заголовка
+    :return: Пауза в секундах или None, если значение не распознано
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Не удалось разобрать заголовок Retry-After: {value!r}")
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return retry_at.timestamp() - time.time()
+
+
+class Throttle:
+    """Ограничитель запросов к GitHub API.
+
+    Не дает выполнять больше max_concurrent запросов одновременно,
+    чтобы параллельные запросы не упирались во вторичный лимит GitHub,
+    и приостанавливает новые запросы, когда GitHub сообщает об исчерпании лимита.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS):
+        """Инициализация ограничителя.
+
+        :param max_concurrent: Максимальное число одновременных запросов
+        """
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._resume_at = 0.0
+
+    async def __aenter__(self) -> None:
+        await self._semaphore.acquire()
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            logger.warning(f"Лимит запросов GitHub API исчерпан, ждем {delay:.1f} с")
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # При отмене во время паузы __aexit__ не вызывается, место в семафоре освобождаем сами
+                self._semaphore.release()
+                raise
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._semaphore.release()
+
+    def update(self, response: httpx.Response) -> None:
+        """Учесть заголовки лимита запросов из ответа GitHub API.
+
+        :param response: Ответ GitHub API
+        """
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and (parsed := parse_retry_after(retry_after)) is not None:
+            pause = parsed
+        elif response.headers.get("X-RateLimit-Remaining") == "0" and (
+            reset := response.headers.get("X-RateLimit-Reset")
+        ):
+            pause = float(reset) - time.time()
+        else:
+            return
+
+        self._resume_at = max(self._resume_at, time.monotonic() + pause)
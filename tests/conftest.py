@@ -0,0 +1,80 @@
+"""
+Общие фикстуры тестов.
+"""
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+# Переменные окружения, которые читает action
+ACTION_ENV_VARS = (
+    "GITHUB_EVENT_NAME",
+    "GITHUB_EVENT_PATH",
+    "GITHUB_OUTPUT",
+    "GITHUB_TOKEN",
+    "INPUT_GITHUB_TOKEN",
+    "INPUT_OPENAI_API_KEY",
+    "OPENAI_API_KEY",
+    "INPUT_CACHE_PATH",
+    "RUNNER_TEMP",
+)
+
+
+@pytest.fixture(scope="session")
+def shared_tmp(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Временный каталог, общий для всех тестов сессии.
+
+    Тесты называют файлы в нем уникально (uuid4), поэтому не мешают друг другу.
+    Тестам, которым важно содержимое каталога, нужен собственный tmp_path.
+    """
+    return tmp_path_factory.mktemp("ai_issue_tests")
+
+
+@pytest.fixture(scope="session")
+def pr_comment_event() -> dict[str, Any]:
+    """Событие нового комментария к PR с триггером.
+
+    Фикстура общая для всей сессии: тесты, которым нужен другой вариант события,
+    меняют его копию (copy.deepcopy).
+    """
+    return {
+        "action": "created",
+        "issue": {
+            "number": 123,
+            "pull_request": {"url": "https://api.github.com/repos/owner/repo/pulls/123"},
+        },
+        "comment": {
+            "body": "Please @aiissue create an issue for this",
+        },
+        "repository": {
+            "full_name": "owner/repo",
+        },
+    }
+
+
+@pytest.fixture
+def clean_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Убрать из окружения переменные, которые читает action.
+
+    Остальное окружение не копируется и не очищается: monkeypatch восстановит только эти переменные.
+    """
+    for name in ACTION_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def test_env(monkeypatch: pytest.MonkeyPatch, clean_env: None) -> dict[str, str]:
+    """Установить переменные окружения с токенами GitHub и OpenAI.
+
+    Зависит от clean_env, чтобы очистка окружения не стерла установленные токены.
+
+    :return: Установленные переменные
+    """
+    env = {
+        "GITHUB_TOKEN": "test_github_token",
+        "INPUT_OPENAI_API_KEY": "test_openai_key",
+    }
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return env
@@ -0,0 +1,97 @@
+"""
+Тесты для кэша ответов.
+"""
+
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+
+from ai_issue.cache import SEMANTIC_CACHE_SIZE, ResponseCache, cosine_similarity
+
+
+class TestResponseCache:
+    """Тесты для класса ResponseCache."""
+
+    def test_roundtrip_through_file(self, shared_tmp: Path) -> None:
+        """Тест сохранения и загрузки кэша из файла."""
+        cache_file = shared_tmp / f"cache_{uuid4().hex}.json"
+
+        cache = ResponseCache(cache_file)
+        cache.set_issue("key", {"title": "Title"})
+        cache.add_similar("owner/repo", [1.0, 0.0], {"title": "Title"})
+        cache.save()
+
+        restored = ResponseCache(cache_file)
+
+        assert restored.get_issue("key") == {"title": "Title"}
+        assert restored.find_similar("owner/repo", [1.0, 0.0], threshold=0.9) == {"title": "Title"}
+
+    def test_find_similar(self) -> None:
+        """Тест поиска содержимого для похожего запроса."""
+        cache = ResponseCache()
+        cache.add_similar("owner/repo", [1.0, 0.0], {"title": "Horizontal"})
+        cache.add_similar("owner/repo", [0.0, 1.0], {"title": "Vertical"})
+
+        assert cache.find_similar("owner/repo", [0.99, 0.05], threshold=0.9) == {"title": "Horizontal"}
+        assert cache.find_similar("owner/repo", [1.0, 1.0], threshold=0.9) is None
+        assert cache.find_similar("other/repo", [1.0, 0.0], threshold=0.9) is None
+
+    def test_may_find_similar(self, shared_tmp: Path) -> None:
+        """Тест: кэш в памяти без записей не может найти похожий запрос."""
+        cache = ResponseCache()
+        assert not cache.may_find_similar("owner/repo")
+
+        cache.add_similar("owner/repo", [1.0, 0.0], {"title": "Title"})
+        assert cache.may_find_similar("owner/repo")
+        assert not cache.may_find_similar("other/repo")
+
+        assert ResponseCache(shared_tmp / f"cache_{uuid4().hex}.json").may_find_similar("owner/repo")
+
+    def test_add_similar_keeps_latest_entries(self) -> None:
+        """Тест ограничения размера семантического кэша."""
+        cache = ResponseCache()
+        for i in range(SEMANTIC_CACHE_SIZE + 5):
+            cache.add_similar("owner/repo", [1.0, float(i)], {"title": str(i)})
+
+        assert len(cache._semantic["owner/repo"]) == SEMANTIC_CACHE_SIZE
+        assert cache._semantic["owner/repo"][0]["content"] == {"title": "5"}
+
+    def test_cosine_similarity(self) -> None:
+        """Тест косинусного сходства."""
+        assert cosine_similarity([1.0, 0.0], [2.0, 0.0]) == 1.0
+        assert cosine_similarity([1.0, 0.0], [0.0, 1.0]) == 0.0
+        assert cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+
+    def test_save_without_changes_does_not_write(self, shared_tmp: Path) -> None:
+        """Тест, что неизмененный кэш не записывается на диск."""
+        cache_file = shared_tmp / f"cache_{uuid4().hex}.json"
+
+        ResponseCache(cache_file).save()
+
+        assert not cache_file.exists()
+
+    def test_corrupted_file_is_ignored(self, shared_tmp: Path) -> None:
+        """Тест загрузки поврежденного файла кэша."""
+        cache_file = shared_tmp / f"cache_{uuid4().hex}.json"
+        cache_file.write_text("not json", encoding="utf-8")
+
+        cache = ResponseCache(cache_file)
+
+        assert cache.get_issue("any") is None
+
+    @pytest.mark.usefixtures("clean_env")
+    def test_from_environment(self, shared_tmp: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Тест выбора пути кэша из переменных окружения."""
+        monkeypatch.setenv("INPUT_CACHE_PATH", "cache.json")
+        assert ResponseCache.from_environment().path == Path("cache.json")
+
+        # Без cache_path кэш остается в памяти, даже если раннер передал RUNNER_TEMP
+        monkeypatch.delenv("INPUT_CACHE_PATH")
+        monkeypatch.setenv("RUNNER_TEMP", str(shared_tmp))
+        assert ResponseCache.from_environment().path is None
+
+    def test_make_key_is_stable(self) -> None:
+        """Тест детерминированности ключа кэша."""
+        assert ResponseCache.make_key("a", "b") == ResponseCache.make_key("a", "b")
+        assert ResponseCache.make_key("a", "b") != ResponseCache.make_key("ab", "")
@@ -2,48 +2,132 @@
 Тесты для генератора issue.
 """
 
-from unittest.mock import MagicMock, Mock, patch
-
+import asyncio
+import json
+import re
+from collections.abc import AsyncIterator
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Self
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+import httpx
 import pytest
 
-from ai_issue.generator import AIIssueGenerator
-from ai_issue.models import IssueContent, PRInfo
+from ai_issue.cache import ResponseCache
+from ai_issue.generator import (
+    ISSUE_BODY_PLACEHOLDER,
+    MAX_DIFF_CHARS,
+    OPENAI_MAX_OUTPUT_TOKENS,
+    AIIssueGenerator,
+    format_options,
+    issue_types_from_labels,
+    restrict_to_available,
+)
+from ai_issue.models import BatchIssueContent, IssueContent, PRInfo
+
+PR_DATA = {
+    "title": "Test PR",
+    "body": "Test PR description",
+    "assignees": {"nodes": [{"login": "user1"}]},
+    "author": {"login": "test_user"},
+    "createdAt": "2024-01-01T00:00:00Z",
+    "changedFiles": 3,
+    "additions": 50,
+    "deletions": 10,
+}
+
+# Информация о PR для тестов генерации, варианты строятся через model_copy
+PR_INFO = PRInfo(
+    title="Test PR",
+    author="test_user",
+    created_at="2024-01-01T00:00:00",
+    files_changed=3,
+    additions=50,
+    deletions=10,
+)
+
+LABELS_DATA: list[dict[str, Any]] = [
+    {"name": "bug", "description": "Something isn't working"},
+    {"name": "feature", "description": None},
+    {"name": "enhancement", "description": "New feature or request"},
+]
+
+AVAILABLE_LABELS: list[tuple[str, str | None]] = [(label["name"], label["description"]) for label in LABELS_DATA]
+
+PR_DIFF = "diff --git a/app.py b/app.py\n+print('hello')\n"
+
+ISSUE_TYPES_DATA = [
+    {"name": "Bug", "description": "An unexpected problem"},
+    {"name": "Task", "description": "A specific piece of work"},
+]
+
+
+def repository_view(
+    labels: list[dict[str, Any]] = LABELS_DATA,
+    has_next_page: bool = False,
+    owner: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Ответ GitHub GraphQL API на запрос PR, меток и типов issue."""
+    return {
+        "data": {
+            "repository": {
+                "pullRequest": PR_DATA,
+                "labels": {"nodes": labels, "pageInfo": {"hasNextPage": has_next_page, "endCursor": "cursor-1"}},
+                "owner": {"issueTypes": {"nodes": ISSUE_TYPES_DATA}} if owner is None else owner,
+            }
+        }
+    }
+
+
+def github_api_handler(request: httpx.Request) -> httpx.Response:
+    """Обработчик запросов к мок-серверу GitHub API."""
+    routes: dict[tuple[str, str], Any] = {
+        ("POST", "/graphql"): repository_view(),
+        ("POST", "/repos/owner/repo/issues"): {"number": 456},
+        ("PATCH", "/repos/owner/repo/issues/456"): {"number": 456},
+        ("PATCH", "/repos/owner/repo/pulls/123"): {"number": 123},
+    }
+    route = (request.method, request.url.path)
+    if request.headers.get("Accept") == "application/vnd.github.diff" and route == (
+        "GET",
+        "/repos/owner/repo/pulls/123",
+    ):
+        return httpx.Response(200, text=PR_DIFF)
+    if route not in routes:
+        return httpx.Response(404, json={"message": "Not Found"})
+    return httpx.Response(200, json=routes[route])
+
+
+class FakeResponseStream:
+    """Поток событий OpenAI Responses API, отдающий JSON ответа по частям."""
+
+    def __init__(self, content: IssueContent, chunk_size: int = 8, error: Exception | None = None):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.error = error
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+    async def __aiter__(self) -> AsyncIterator[SimpleNamespace]:
+        text = self.content.model_dump_json()
+        for end in range(self.chunk_size, len(text) + self.chunk_size, self.chunk_size):
+            yield SimpleNamespace(type="response.output_text.delta", snapshot=text[:end])
+        if self.error:
+            raise self.error
+
+    async def get_final_response(self) -> SimpleNamespace:
+        return SimpleNamespace(output_parsed=self.content)
 
 
 @pytest.fixture
-def mock_github() -> Mock:
-    """Мок для GitHub API."""
-    mock = MagicMock()
-
-    # Мок для PR
-    mock_pr = MagicMock()
-    mock_pr.title = "Test PR"
-    mock_pr.body = "Test PR description"
-    mock_pr.assignees = []
-    mock_pr.user.login = "test_user"
-    mock_pr.created_at.isoformat.return_value = "2024-01-01T00:00:00"
-    mock_pr.changed_files = 3
-    mock_pr.additions = 50
-    mock_pr.deletions = 10
-    mock_pr.number = 123
-
-    # Мок для репозитория
-    mock_repo = MagicMock()
-    mock_repo.get_pull.return_value = mock_pr
-    mock_repo.get_labels.return_value = [
-        MagicMock(name="bug"),
-        MagicMock(name="feature"),
-        MagicMock(name="enhancement"),
-    ]
-
-    # Мок для созданного issue
-    mock_issue = MagicMock()
-    mock_issue.number = 456
-    mock_repo.create_issue.return_value = mock_issue
-
-    mock.get_repo.return_value = mock_repo
-
-    return mock
+def github_requests() -> list[httpx.Request]:
+    """Список запросов, отправленных к мок-серверу GitHub API."""
+    return []
 
 
 @pytest.fixture
@@ -51,59 +135,45 @@ def mock_openai() -> Mock:
     """Мок для OpenAI API."""
     mock = MagicMock()
 
-    # Мок для ответа OpenAI
-    mock_response = MagicMock()
-    mock_response.choices[0].message.parsed = IssueContent(
+    # Мок для потокового ответа OpenAI
+    content = IssueContent(
         title="Generated Issue Title",
         body="Generated issue body",
         labels=["bug"],
-        issue_type="bug",
+        issue_type="Bug",
     )
-
-    mock.beta.chat.completions.parse.return_value = mock_response
+    mock.responses.stream.side_effect = lambda **_: FakeResponseStream(content)
+    mock.embeddings.create = AsyncMock(return_value=MagicMock(data=[MagicMock(embedding=[1.0, 0.0])]))
+    mock.responses.create = AsyncMock(return_value=MagicMock(output_text=" Regenerated Issue Title \n"))
 
     return mock
 
 
-class TestAIIssueGenerator:
-    """Тесты для класса AIIssueGenerator."""
+@pytest.fixture
+def generator(mock_openai: Mock, github_requests: list[httpx.Request]) -> AIIssueGenerator:
+    """Генератор issue с моками OpenAI и HTTP-транспорта GitHub."""
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_initialization(
-        self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
-        mock_openai: Mock,
-    ) -> None:
-        """Тест инициализации генератора."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
+    def handler(request: httpx.Request) -> httpx.Response:
+        github_requests.append(request)
+        return github_api_handler(request)
 
+    with patch("ai_issue.generator.AsyncOpenAI", return_value=mock_openai):
         generator = AIIssueGenerator(
             github_token="test_token",
             openai_api_key="test_api_key",
             repository="owner/repo",
             pr_number=123,
         )
+    generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return generator
 
-        assert generator.repository == "owner/repo"
-        assert generator.pr_number == 123
-        mock_github_class.assert_called_once_with("test_token")
-        mock_openai_class.assert_called_once_with(api_key="test_api_key")
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_get_available_labels(
-        self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
-        mock_openai: Mock,
-    ) -> None:
-        """Тест получения доступных меток."""
-        mock_github_class.return_value = mock_github
+class TestAIIssueGenerator:
+    """Тесты для класса AIIssueGenerator."""
+
+    @patch("ai_issue.generator.AsyncOpenAI")
+    def test_initialization(self, mock_openai_class: Mock, mock_openai: Mock) -> None:
+        """Тест инициализации генератора."""
         mock_openai_class.return_value = mock_openai
 
         generator = AIIssueGenerator(
@@ -113,214 +183,705 @@ class TestAIIssueGenerator:
             pr_number=123,
         )
 
-        labels = generator.get_available_labels()
+        assert generator.repository == "owner/repo"
+        assert generator.pr_number == 123
+        assert generator._github_headers["Authorization"] == "Bearer test_token"
+        assert generator._github_headers["Accept"] == "application/vnd.github+json"
+        # Общий HTTP-клиент не должен отправлять токен GitHub в OpenAI
+        assert "Authorization" not in generator._http.headers
+        mock_openai_class.assert_called_once_with(api_key="test_api_key", http_client=generator._http)
+
+    @pytest.mark.asyncio
+    async def test_get_available_labels(self, generator: AIIssueGenerator) -> None:
+        """Тест получения доступных меток."""
+        labels = await generator.get_available_labels()
+
+        assert labels == [
+            ("bug", "Something isn't working"),
+            ("feature", None),
+            ("enhancement", "New feature or request"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_available_labels_follows_cursor(self, generator: AIIssueGenerator) -> None:
+        """Тест получения меток со следующих страниц по курсору."""
+        variables: list[dict[str, Any]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            variables.append(payload["variables"])
+            if payload["variables"].get("cursor") == "cursor-1":
+                labels = {"nodes": LABELS_DATA[2:], "pageInfo": {"hasNextPage": False, "endCursor": None}}
+                return httpx.Response(200, json={"data": {"repository": {"labels": labels}}})
+            return httpx.Response(200, json=repository_view(labels=LABELS_DATA[:2], has_next_page=True))
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        labels = await generator.get_available_labels()
+
+        assert [name for name, _ in labels] == ["bug", "feature", "enhancement"]
+        assert variables == [
+            {"owner": "owner", "name": "repo", "number": 123},
+            {"owner": "owner", "name": "repo", "cursor": "cursor-1"},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_labels_requested_by_max_page(self, generator: AIIssueGenerator) -> None:
+        """Тест: метки на всех страницах запрашиваются максимальным для GitHub размером страницы."""
+        page_sizes: list[int] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payload = json.loads(request.content)
+            page_sizes.extend(int(size) for size in re.findall(r"labels\(first: (\d+)", payload["query"]))
+            if payload["variables"].get("cursor") == "cursor-1":
+                labels = {"nodes": LABELS_DATA[2:], "pageInfo": {"hasNextPage": False, "endCursor": None}}
+                return httpx.Response(200, json={"data": {"repository": {"labels": labels}}})
+            return httpx.Response(200, json=repository_view(labels=LABELS_DATA[:2], has_next_page=True))
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        await generator.get_available_labels()
+
+        assert page_sizes == [100, 100]
+
+    @pytest.mark.asyncio
+    async def test_repository_view_is_fetched_once(
+        self,
+        generator: AIIssueGenerator,
+        github_requests: list[httpx.Request],
+    ) -> None:
+        """Тест получения PR, меток и типов issue одним запросом GraphQL."""
+        await asyncio.gather(
+            generator.get_pr_info(),
+            generator.get_available_labels(),
+            generator.get_available_issue_types(),
+        )
+        await generator.get_available_labels()
+
+        assert [(request.method, request.url.path) for request in github_requests] == [("POST", "/graphql")]
+
+    @pytest.mark.asyncio
+    async def test_repository_view_is_refetched_after_error(self, generator: AIIssueGenerator) -> None:
+        """Тест повторного запроса данных репозитория после ошибки."""
+        responses = [httpx.Response(502), httpx.Response(200, json=repository_view())]
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda _: responses.pop(0)))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await generator.get_available_labels()
+        labels = await generator.get_available_labels()
+
+        assert [name for name, _ in labels] == ["bug", "feature", "enhancement"]
+        assert responses == []
+
+    @pytest.mark.asyncio
+    async def test_graphql_errors_are_raised(self, generator: AIIssueGenerator) -> None:
+        """Тест обработки ошибок в ответе GraphQL."""
+        generator._http = httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda _: httpx.Response(200, json={"data": None, "errors": [{"message": "Could not resolve"}]})
+            ),
+        )
 
-        assert labels == ["bug", "feature", "enhancement"]
+        with pytest.raises(RuntimeError, match="Could not resolve"):
+            await generator.get_pr_info()
+
+    @pytest.mark.asyncio
+    async def test_get_available_issue_types(self, generator: AIIssueGenerator) -> None:
+        """Тест получения доступных типов issue."""
+        issue_types = await generator.get_available_issue_types()
+
+        assert issue_types == [
+            ("Bug", "An unexpected problem"),
+            ("Task", "A specific piece of work"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_available_issue_types_for_user_repository(self, generator: AIIssueGenerator) -> None:
+        """Тест репозитория пользователя, у которого типы issue берутся из меток."""
+        labels = [{"name": "bug", "description": None}, {"name": "wontfix", "description": None}]
+        generator._http = httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda _: httpx.Response(200, json=repository_view(labels=labels, owner={})),
+            ),
+        )
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_get_pr_info(
+        assert await generator.get_available_issue_types() == [("bug", None)]
+
+    @pytest.mark.asyncio
+    async def test_get_available_issue_types_when_types_are_forbidden(self, generator: AIIssueGenerator) -> None:
+        """Тест: ошибка доступа к типам issue организации не мешает взять типы из меток."""
+        labels = [{"name": "bug", "description": None}, {"name": "wontfix", "description": None}]
+        view = repository_view(labels=labels, owner={"issueTypes": None})
+        view["errors"] = [
+            {
+                "type": "FORBIDDEN",
+                "path": ["repository", "owner", "issueTypes"],
+                "message": "Resource not accessible by integration",
+            }
+        ]
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda _: httpx.Response(200, json=view)))
+
+        assert await generator.get_available_issue_types() == [("bug", None)]
+        assert (await generator.get_pr_info()).title == "Test PR"
+
+    @pytest.mark.asyncio
+    async def test_process_sets_label_issue_type_as_label(
         self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
+        generator: AIIssueGenerator,
         mock_openai: Mock,
+        github_requests: list[httpx.Request],
     ) -> None:
-        """Тест получения информации о PR."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
+        """Тест, что тип issue из меток ставится меткой, а не полем type."""
+        content = IssueContent(title="Generated Issue Title", body="Body", labels=["enhancement"], issue_type="bug")
+        mock_openai.responses.stream.side_effect = lambda **_: FakeResponseStream(content)
 
-        generator = AIIssueGenerator(
-            github_token="test_token",
-            openai_api_key="test_api_key",
-            repository="owner/repo",
-            pr_number=123,
-        )
+        def handler(request: httpx.Request) -> httpx.Response:
+            github_requests.append(request)
+            if request.url.path == "/graphql":
+                return httpx.Response(200, json=repository_view(owner={}))
+            return github_api_handler(request)
 
-        pr_info = generator.get_pr_info()
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        await generator.process()
+
+        update = next(request for request in github_requests if request.url.path == "/repos/owner/repo/issues/456")
+        assert json.loads(update.content)["labels"] == ["enhancement", "bug"]
+        assert json.loads(update.content)["type"] is None
+
+    @pytest.mark.asyncio
+    async def test_get_pr_info(self, generator: AIIssueGenerator) -> None:
+        """Тест получения информации о PR."""
+        pr_info = await generator.get_pr_info()
 
         assert isinstance(pr_info, PRInfo)
         assert pr_info.title == "Test PR"
         assert pr_info.body == "Test PR description"
+        assert pr_info.assignees == ["user1"]
         assert pr_info.author == "test_user"
+        assert pr_info.created_at == "2024-01-01T00:00:00Z"
         assert pr_info.files_changed == 3
         assert pr_info.additions == 50
         assert pr_info.deletions == 10
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_generate_issue_content(
-        self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
-        mock_openai: Mock,
-    ) -> None:
-        """Тест генерации содержимого issue."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
+    @pytest.mark.asyncio
+    async def test_get_pr_diff(self, generator: AIIssueGenerator) -> None:
+        """Тест получения diff PR."""
+        assert await generator.get_pr_diff() == PR_DIFF
 
-        generator = AIIssueGenerator(
-            github_token="test_token",
-            openai_api_key="test_api_key",
-            repository="owner/repo",
-            pr_number=123,
+    @pytest.mark.asyncio
+    async def test_get_pr_diff_is_truncated(self, generator: AIIssueGenerator) -> None:
+        """Тест обрезки большого diff PR."""
+        generator._http = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda _: httpx.Response(200, text="+" * (MAX_DIFF_CHARS * 3))),
         )
 
-        pr_info = PRInfo(
-            title="Test PR",
-            body="Test description",
-            author="test_user",
-            created_at="2024-01-01T00:00:00",
-            files_changed=3,
-            additions=50,
-            deletions=10,
+        assert len(await generator.get_pr_diff()) == MAX_DIFF_CHARS
+
+    @pytest.mark.asyncio
+    async def test_get_pr_diff_unavailable(self, generator: AIIssueGenerator) -> None:
+        """Тест обработки PR, diff которого GitHub не отдает."""
+        generator._http = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda _: httpx.Response(406, json={"message": "too_large"})),
         )
 
-        issue_content = generator.generate_issue_content(
+        assert await generator.get_pr_diff() == ""
+
+    @pytest.mark.asyncio
+    async def test_get_pr_diff_transport_error(self, generator: AIIssueGenerator) -> None:
+        """Тест: сетевая ошибка при чтении diff не прерывает создание issue."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        assert await generator.get_pr_diff() == ""
+
+    @pytest.mark.asyncio
+    async def test_generate_issue_content(self, generator: AIIssueGenerator, mock_openai: Mock) -> None:
+        """Тест генерации содержимого issue."""
+        pr_info = PR_INFO.model_copy(update={"body": "Test description"})
+
+        issue_content = await generator.generate_issue_content(
             pr_info=pr_info,
-            available_labels=["bug", "feature"],
-            available_types=["bug", "feature", "enhancement"],
+            available_labels=[("bug", "Something isn't working"), ("feature", None)],
+            available_types=[("Bug", "An unexpected problem")],
+            pr_diff=PR_DIFF,
         )
 
         assert isinstance(issue_content, IssueContent)
         assert issue_content.title == "Generated Issue Title"
         assert issue_content.body == "Generated issue body"
         assert issue_content.labels == ["bug"]
-        assert issue_content.issue_type == "bug"
-
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_create_issue(
-        self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
-        mock_openai: Mock,
-    ) -> None:
+        assert issue_content.issue_type == "Bug"
+
+        prompt = mock_openai.responses.stream.call_args.kwargs["input"]
+        assert "Test PR" in prompt
+        assert "Something isn't working" in prompt
+        assert PR_DIFF in prompt
+        assert "- feature\n" in prompt
+        assert "None" not in prompt
+        assert mock_openai.responses.stream.call_args.kwargs["max_output_tokens"] == OPENAI_MAX_OUTPUT_TOKENS
+
+    @pytest.mark.asyncio
+    async def test_create_issue(self, generator: AIIssueGenerator, github_requests: list[httpx.Request]) -> None:
         """Тест создания issue в GitHub."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
-
-        generator = AIIssueGenerator(
-            github_token="test_token",
-            openai_api_key="test_api_key",
-            repository="owner/repo",
-            pr_number=123,
-        )
-
         issue_content = IssueContent(
             title="Test Issue",
             body="Test issue body",
             labels=["bug"],
-            issue_type="bug",
+            issue_type="Bug",
         )
 
-        issue_number = generator.create_issue(
+        issue_number = await generator.create_issue(
             issue_content=issue_content,
             assignees=["user1", "user2"],
         )
 
         assert issue_number == 456
-        generator.repo.create_issue.assert_called_once_with(
-            title="Test Issue",
-            body="Test issue body",
-            labels=["bug"],  # Метка bug уже содержит тип, не дублируем
-            assignees=["user1", "user2"],
-        )
+        assert len(github_requests) == 1
+        request = github_requests[0]
+        assert request.method == "POST"
+        assert request.url.path == "/repos/owner/repo/issues"
+        assert request.headers["Authorization"] == "Bearer test_token"
+        assert json.loads(request.content) == {
+            "title": "Test Issue",
+            "body": "Test issue body",
+            "labels": ["bug"],
+            "type": "Bug",
+            "assignees": ["user1", "user2"],
+        }
+
+    @pytest.mark.asyncio
+    async def test_update_pr_description(
+        self,
+        generator: AIIssueGenerator,
+        github_requests: list[httpx.Request],
+    ) -> None:
+        """Тест обновления описания PR."""
+        await generator.update_pr_description(issue_number=456, current_body="Test PR description")
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_create_issue_with_different_type(
+        assert len(github_requests) == 1
+        request = github_requests[0]
+        assert request.method == "PATCH"
+        assert request.url.path == "/repos/owner/repo/pulls/123"
+        assert json.loads(request.content) == {"body": "Test PR description\n\nCloses #456"}
+
+    @pytest.mark.asyncio
+    async def test_update_pr_description_empty_body(
         self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
-        mock_openai: Mock,
+        generator: AIIssueGenerator,
+        github_requests: list[httpx.Request],
     ) -> None:
-        """Тест создания issue когда тип отличается от меток."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
+        """Тест обновления PR без описания."""
+        await generator.update_pr_description(issue_number=456, current_body="")
 
-        generator = AIIssueGenerator(
-            github_token="test_token",
-            openai_api_key="test_api_key",
-            repository="owner/repo",
-            pr_number=123,
-        )
+        assert json.loads(github_requests[0].content) == {"body": "Closes #456"}
 
-        issue_content = IssueContent(
-            title="New Feature",
-            body="Feature description",
-            labels=["documentation", "help wanted"],
-            issue_type="feature",
-        )
+    @pytest.mark.asyncio
+    async def test_update_pr_description_skips_linked_issue(
+        self,
+        generator: AIIssueGenerator,
+        github_requests: list[httpx.Request],
+    ) -> None:
+        """Тест пропуска обновления, если описание PR уже закрывает issue."""
+        await generator.update_pr_description(issue_number=456, current_body="Fixes #456.")
 
-        issue_number = generator.create_issue(
-            issue_content=issue_content,
-            assignees=["user1"],
-        )
+        assert github_requests == []
+
+    @pytest.mark.asyncio
+    async def test_update_pr_description_ignores_longer_number(
+        self,
+        generator: AIIssueGenerator,
+        github_requests: list[httpx.Request],
+    ) -> None:
+        """Тест: ссылка на #4567 не считается ссылкой на #456."""
+        await generator.update_pr_description(issue_number=456, current_body="See #4567")
+
+        assert len(github_requests) == 1
+        assert json.loads(github_requests[0].content) == {"body": "See #4567\n\nCloses #456"}
+
+    @pytest.mark.parametrize(
+        "current_body",
+        ["See #456", "color: #456;", "Fixes #456abc", "Fixes other/repo#456", "Fixes #456/1"],
+    )
+    @pytest.mark.asyncio
+    async def test_update_pr_description_ignores_non_closing_reference(
+        self,
+        generator: AIIssueGenerator,
+        github_requests: list[httpx.Request],
+        current_body: str,
+    ) -> None:
+        """Тест: упоминание, цвет или ссылка на другой репозиторий не заменяют закрывающую ссылку."""
+        await generator.update_pr_description(issue_number=456, current_body=current_body)
+
+        assert json.loads(github_requests[0].content) == {"body": f"{current_body}\n\nCloses #456"}
+
+    @pytest.mark.asyncio
+    async def test_process_full_flow(
+        self,
+        generator: AIIssueGenerator,
+        mock_openai: Mock,
+        github_requests: list[httpx.Request],
+    ) -> None:
+        """Тест полного процесса создания issue."""
+        async with generator:
+            issue_number = await generator.process()
 
         assert issue_number == 456
-        generator.repo.create_issue.assert_called_once_with(
-            title="New Feature",
-            body="Feature description",
-            labels=["documentation", "help wanted", "feature"],  # Тип добавлен к меткам
-            assignees=["user1"],
-        )
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_update_pr_description(
+        # Проверяем, что все методы были вызваны
+        mock_openai.responses.stream.assert_called_once()
+        writes = {
+            (request.method, request.url.path): request
+            for request in github_requests
+            if request.method != "GET" and request.url.path != "/graphql"
+        }
+        assert set(writes) == {
+            ("POST", "/repos/owner/repo/issues"),
+            ("PATCH", "/repos/owner/repo/issues/456"),
+            ("PATCH", "/repos/owner/repo/pulls/123"),
+        }
+        # Issue создается по одному заголовку и дополняется после завершения потока
+        created = json.loads(writes["POST", "/repos/owner/repo/issues"].content)
+        assert created["title"] == "Generated Issue Title"
+        assert created["body"] == ISSUE_BODY_PLACEHOLDER
+        assert created["assignees"] == ["user1"]
+        assert json.loads(writes["PATCH", "/repos/owner/repo/issues/456"].content) == {
+            "title": "Generated Issue Title",
+            "body": "Generated issue body",
+            "labels": ["bug"],
+            "type": "Bug",
+        }
+
+    @pytest.mark.asyncio
+    async def test_process_fetches_pr_data_concurrently(self, generator: AIIssueGenerator) -> None:
+        """Тест параллельного получения diff и данных PR перед генерацией."""
+        diff_requested = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("Accept") == "application/vnd.github.diff":
+                diff_requested.set()
+            if request.url.path == "/graphql":
+                # При последовательном выполнении diff еще не запрошен и таймаут истекает
+                await asyncio.wait_for(diff_requested.wait(), timeout=1)
+            return github_api_handler(request)
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        assert await generator.process() == 456
+
+    @pytest.mark.asyncio
+    async def test_process_updates_issue_and_pr_concurrently(self, generator: AIIssueGenerator) -> None:
+        """Тест параллельного дополнения issue и обновления описания PR."""
+        pr_updated = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "PATCH" and request.url.path == "/repos/owner/repo/pulls/123":
+                pr_updated.set()
+            if request.method == "PATCH" and request.url.path == "/repos/owner/repo/issues/456":
+                # При последовательном выполнении PR еще не обновлен и таймаут истекает
+                await asyncio.wait_for(pr_updated.wait(), timeout=1)
+            return github_api_handler(request)
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        assert await generator.process() == 456
+
+    @pytest.mark.asyncio
+    async def test_process_returns_before_pr_update(self, generator: AIIssueGenerator) -> None:
+        """Тест, что process не ждет обновления описания PR."""
+        release_pr_update = asyncio.Event()
+        pr_updated = False
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal pr_updated
+            if request.method == "PATCH" and request.url.path == "/repos/owner/repo/pulls/123":
+                await release_pr_update.wait()
+                pr_updated = True
+            return github_api_handler(request)
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        async with generator:
+            assert await generator.process() == 456
+            assert not pr_updated
+            release_pr_update.set()
+
+        # Выход из контекста дожидается фонового обновления PR
+        assert pr_updated
+
+    @pytest.mark.asyncio
+    async def test_process_closes_issue_when_generation_fails(
         self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
+        generator: AIIssueGenerator,
         mock_openai: Mock,
+        github_requests: list[httpx.Request],
     ) -> None:
-        """Тест обновления описания PR."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
+        """Тест закрытия issue, созданного по заголовку, при обрыве потока OpenAI."""
+        content = IssueContent(title="Generated Issue Title", body="Generated issue body")
+        mock_openai.responses.stream.side_effect = lambda **_: FakeResponseStream(
+            content, error=Exception("Stream interrupted")
+        )
 
-        generator = AIIssueGenerator(
-            github_token="test_token",
-            openai_api_key="test_api_key",
-            repository="owner/repo",
-            pr_number=123,
+        with pytest.raises(Exception, match="Stream interrupted"):
+            await generator.process()
+
+        writes = [
+            (request.method, request.url.path)
+            for request in github_requests
+            if request.method != "GET" and request.url.path != "/graphql"
+        ]
+        assert writes == [("POST", "/repos/owner/repo/issues"), ("PATCH", "/repos/owner/repo/issues/456")]
+        assert json.loads(github_requests[-1].content) == {"state": "closed", "state_reason": "not_planned"}
+
+    @pytest.mark.asyncio
+    async def test_process_closes_issue_when_update_fails(self, generator: AIIssueGenerator) -> None:
+        """Тест закрытия issue с заглушкой, если дополнить его содержимым не удалось."""
+        issue_patches: list[dict[str, Any]] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "PATCH" and request.url.path == "/repos/owner/repo/issues/456":
+                payload = json.loads(request.content)
+                issue_patches.append(payload)
+                if "state" not in payload:
+                    return httpx.Response(500, json={"message": "Server Error"})
+            return github_api_handler(request)
+
+        generator._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await generator.process()
+
+        assert issue_patches[-1] == {"state": "closed", "state_reason": "not_planned"}
+
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_reports_title_early(
+        self,
+        generator: AIIssueGenerator,
+        mock_openai: Mock,
+    ) -> None:
+        """Тест вызова on_title, как только заголовок сгенерирован целиком."""
+        content = IssueContent(title="Generated Issue Title", body="Generated issue body " * 20)
+        mock_openai.responses.stream.side_effect = lambda **_: FakeResponseStream(content, chunk_size=4)
+        titles: list[str] = []
+
+        issue_content = await generator.generate_issue_content(
+            PR_INFO,
+            [],
+            [],
+            on_title=titles.append,
         )
 
-        generator.update_pr_description(issue_number=456)
+        assert titles == ["Generated Issue Title"]
+        assert issue_content == content
+
+    @pytest.mark.asyncio
+    async def test_aclose(self, generator: AIIssueGenerator) -> None:
+        """Тест закрытия HTTP-клиента при выходе из контекста."""
+        async with generator:
+            pass
 
-        generator.pr.edit.assert_called_once()
-        call_args = generator.pr.edit.call_args
-        assert "Closes #456" in call_args[1]["body"]
+        assert generator._http.is_closed
 
-    @patch("ai_issue.generator.Github")
-    @patch("ai_issue.generator.OpenAI")
-    def test_process_full_flow(
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_fills_prompt_template(
         self,
-        mock_openai_class: Mock,
-        mock_github_class: Mock,
-        mock_github: Mock,
+        generator: AIIssueGenerator,
         mock_openai: Mock,
     ) -> None:
-        """Тест полного процесса создания issue."""
-        mock_github_class.return_value = mock_github
-        mock_openai_class.return_value = mock_openai
+        """Тест заполнения шаблона промпта: текст PR не раскрывается, пустые списки подписаны."""
+        pr_info = PR_INFO.model_copy(update={"title": "Price $title", "body": "Costs $5 and ${diff}"})
+
+        await generator.generate_issue_content(pr_info, [], [])
+
+        prompt = mock_openai.responses.stream.call_args.kwargs["input"]
+        assert "- Заголовок: Price $title\n" in prompt
+        assert "- Описание: Costs $5 and ${diff}\n" in prompt
+        assert "Доступные метки issue в репозитории:\nнет доступных меток\n" in prompt
+        assert "Доступные типы issue в репозитории:\nнет доступных типов\n" in prompt
+
+    @pytest.mark.asyncio
+    async def test_generate_issues_batched(self, generator: AIIssueGenerator, mock_openai: Mock) -> None:
+        """Тест пакетной генерации issue для нескольких PR."""
+        prs = [PR_INFO.model_copy(update={"title": f"PR {index}"}) for index in range(3)]
+
+        async def parse(**kwargs: Any) -> SimpleNamespace:
+            titles = [
+                line.removeprefix("- Заголовок: ") for line in kwargs["input"].splitlines() if "Заголовок:" in line
+            ]
+            items = [IssueContent(title=f"Issue for {title}", body="Body") for title in titles]
+            return SimpleNamespace(output_parsed=BatchIssueContent(items=items))
+
+        mock_openai.responses.parse = AsyncMock(side_effect=parse)
+
+        issues = await generator.generate_issues_batched(prs, [("bug", None)], [], batch_size=2)
+
+        assert [issue.title for issue in issues] == ["Issue for PR 0", "Issue for PR 1", "Issue for PR 2"]
+        assert mock_openai.responses.parse.await_count == 2
+        first_prompt = mock_openai.responses.parse.await_args_list[0].kwargs["input"]
+        assert "Верни ровно 2 issue" in first_prompt
+        assert "### Pull Request 2\n" in first_prompt
+        mock_openai.responses.stream.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_generate_issues_batched_rejects_wrong_count(
+        self,
+        generator: AIIssueGenerator,
+        mock_openai: Mock,
+    ) -> None:
+        """Тест ошибки, когда модель вернула не столько issue, сколько PR."""
+        batch = BatchIssueContent(items=[IssueContent(title="Only one", body="Body")])
+        mock_openai.responses.parse = AsyncMock(return_value=SimpleNamespace(output_parsed=batch))
 
-        generator = AIIssueGenerator(
-            github_token="test_token",
-            openai_api_key="test_api_key",
-            repository="owner/repo",
-            pr_number=123,
-        )
+        with pytest.raises(ValueError, match="вернул 1 issue вместо 2"):
+            await generator.generate_issues_batched([PR_INFO, PR_INFO], [], [])
 
-        issue_number = generator.process()
+    @pytest.mark.asyncio
+    async def test_generate_issues_batched_single_pr(self, generator: AIIssueGenerator, mock_openai: Mock) -> None:
+        """Тест, что один PR генерируется обычным потоковым запросом."""
+        issues = await generator.generate_issues_batched([PR_INFO], [], [])
 
-        assert issue_number == 456
+        assert [issue.title for issue in issues] == ["Generated Issue Title"]
+        mock_openai.responses.stream.assert_called_once()
 
-        # Проверяем, что все методы были вызваны
-        generator.repo.get_labels.assert_called()
-        mock_openai.beta.chat.completions.parse.assert_called_once()
-        generator.repo.create_issue.assert_called_once()
-        generator.pr.edit.assert_called_once()
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_uses_cache(self, generator: AIIssueGenerator, mock_openai: Mock) -> None:
+        """Тест повторной генерации содержимого issue из кэша."""
+        first = await generator.generate_issue_content(PR_INFO, [("bug", None)], [])
+        second = await generator.generate_issue_content(PR_INFO, [("bug", None)], [])
+
+        assert first == second
+        mock_openai.responses.stream.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_uses_semantic_cache(
+        self, generator: AIIssueGenerator, mock_openai: Mock, tmp_path: Path
+    ) -> None:
+        """Тест повторного использования issue похожего PR с новым заголовком."""
+        generator.cache = ResponseCache(tmp_path / "cache.json")
+        first_pr = PR_INFO.model_copy(update={"title": "Bump requests to 2.32.3", "author": "dependabot"})
+        second_pr = first_pr.model_copy(update={"title": "Bump requests to 2.32.4"})
+
+        first = await generator.generate_issue_content(first_pr, [("dependencies", None)], [])
+        second = await generator.generate_issue_content(second_pr, [("dependencies", None)], [])
+
+        mock_openai.responses.stream.assert_called_once()
+        mock_openai.responses.create.assert_called_once()
+        assert mock_openai.responses.create.call_args.kwargs["model"] == "gpt-5-mini"
+        assert second.title == "Regenerated Issue Title"
+        assert second.body == first.body
+        assert second.labels == first.labels
+
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_empty_fast_title(
+        self, generator: AIIssueGenerator, mock_openai: Mock, tmp_path: Path
+    ) -> None:
+        """Тест: пустой заголовок быстрой модели не попадает в issue и в кэш."""
+        generator.cache = ResponseCache(tmp_path / "cache.json")
+        first_pr = PR_INFO.model_copy(update={"title": "Bump requests to 2.32.3", "author": "dependabot"})
+        second_pr = first_pr.model_copy(update={"title": "Bump requests to 2.32.4"})
+        mock_openai.responses.create.return_value = MagicMock(output_text=" \n")
+
+        first = await generator.generate_issue_content(first_pr, [("dependencies", None)], [])
+        second = await generator.generate_issue_content(second_pr, [("dependencies", None)], [])
+        await generator.generate_issue_content(second_pr, [("dependencies", None)], [])
+
+        assert second.title == first.title
+        # Запись с пустым заголовком не сохранена, поэтому следующий запуск снова генерирует заголовок
+        assert mock_openai.responses.create.await_count == 2
+        mock_openai.responses.stream.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_without_embeddings(
+        self, generator: AIIssueGenerator, mock_openai: Mock, tmp_path: Path
+    ) -> None:
+        """Тест генерации issue, когда эмбеддинги недоступны."""
+        generator.cache = ResponseCache(tmp_path / "cache.json")
+        mock_openai.embeddings.create.side_effect = Exception("Embeddings API Error")
+
+        issue_content = await generator.generate_issue_content(PR_INFO, [], [])
+
+        assert issue_content.title == "Generated Issue Title"
+        mock_openai.responses.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_generate_issue_content_skips_embedding_without_cache_file(
+        self, generator: AIIssueGenerator, mock_openai: Mock
+    ) -> None:
+        """Тест: без файла кэша и записей в памяти эмбеддинг не запрашивается."""
+        await generator.generate_issue_content(PR_INFO, [], [])
+
+        mock_openai.embeddings.create.assert_not_called()
+        mock_openai.responses.stream.assert_called_once()
+
+
+class TestFormatOptions:
+    """Тесты для форматирования меток и типов issue в промпте."""
+
+    def test_skips_empty_descriptions(self) -> None:
+        """Тест пропуска пустых описаний."""
+        options = (("bug", "Something isn't working"), ("feature", None), ("docs", ""))
+
+        assert format_options(options) == "- bug\n  — Something isn't working\n- feature\n- docs"
+
+    def test_empty_list(self) -> None:
+        """Тест форматирования пустого списка."""
+        assert format_options(()) == ""
+
+
+class TestIssueTypesFromLabels:
+    """Тесты для выбора типов issue среди меток."""
+
+    def test_exact_and_prefixed_labels(self) -> None:
+        """Тест выбора меток с названием типа или префиксом type:/kind/."""
+        labels: list[tuple[str, str | None]] = [
+            ("Bug", "desc"),
+            ("type: refactor", None),
+            ("kind/cleanup", None),
+            ("good first issue", None),
+        ]
+
+        assert issue_types_from_labels(labels) == [("Bug", "desc"), ("type: refactor", None), ("kind/cleanup", None)]
+
+    def test_falls_back_to_substring_match(self) -> None:
+        """Тест выбора меток, содержащих название типа, если точных совпадений нет."""
+        labels: list[tuple[str, str | None]] = [("critical-bug", None), ("needs-docs", None), ("wontfix", None)]
+
+        assert issue_types_from_labels(labels) == [("critical-bug", None), ("needs-docs", None)]
+
+    def test_no_matching_labels(self) -> None:
+        """Тест репозитория без подходящих меток."""
+        assert issue_types_from_labels([("wontfix", None), ("duplicate", None)]) == []
+
+    def test_exact_match_after_substring_match(self) -> None:
+        """Тест: точное совпадение в конце списка отменяет найденные ранее нестрогие."""
+        labels: list[tuple[str, str | None]] = [("critical-bug", None), ("feature", None), ("needs-docs", None)]
+
+        assert issue_types_from_labels(labels) == [("feature", None)]
+
+
+class TestRestrictToAvailable:
+    """Тесты для отбора доступных меток и типа issue."""
+
+    def test_drops_unknown_labels_and_type(self) -> None:
+        """Тест удаления меток и типа, которых нет в репозитории."""
+        content = IssueContent(title="Title", body="Body", labels=["bug", "made-up"], issue_type="Epic")
+
+        result = restrict_to_available(content, AVAILABLE_LABELS, [("Bug", None), ("Task", None)])
+
+        assert result.labels == ["bug"]
+        assert result.issue_type is None
+
+    def test_drops_duplicate_labels(self) -> None:
+        """Тест удаления повторов меток с сохранением порядка."""
+        content = IssueContent(title="Title", body="Body", labels=["feature", "bug", "feature"])
+
+        assert restrict_to_available(content, AVAILABLE_LABELS, []).labels == ["feature", "bug"]
+
+    def test_keeps_available_content(self) -> None:
+        """Тест: содержимое только с доступными метками и типом не копируется."""
+        content = IssueContent(title="Title", body="Body", labels=["feature"], issue_type="Task")
+
+        assert restrict_to_available(content, AVAILABLE_LABELS, [("Task", None)]) is content
@@ -0,0 +1,131 @@
+"""
+Тесты для чтения события GitHub и записи outputs.
+"""
+
+import copy
+import json
+import os
+import re
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+from uuid import uuid4
+
+import orjson
+import pytest
+
+from ai_issue.github_io import parse_github_event, set_github_output, set_github_outputs
+
+# Сообщения об ошибках parse_github_event, скомпилированные один раз для pytest.raises(match=...)
+NOT_PR_COMMENT_ERROR = re.compile("не является комментарием к Pull Request")
+NO_EVENT_PATH_ERROR = re.compile("GITHUB_EVENT_PATH не найден")
+EVENT_FILE_NOT_FOUND_ERROR = re.compile("Файл события не найден")
+
+
+@pytest.fixture
+def load_event(monkeypatch: pytest.MonkeyPatch) -> Callable[[dict[str, Any]], None]:
+    """Подставить событие GitHub без записи в файл и разбора JSON.
+
+    Чтение файла проверяет test_parse_valid_pr_comment_event, остальным тестам достаточно готового словаря.
+    """
+
+    def load(event: dict[str, Any]) -> None:
+        monkeypatch.setenv("GITHUB_EVENT_PATH", "event.json")
+        monkeypatch.setattr(Path, "read_bytes", lambda self: b"")
+        monkeypatch.setattr(orjson, "loads", lambda data: event)
+
+    return load
+
+
+class TestParseGithubEvent:
+    """Тесты для функции parse_github_event."""
+
+    def test_parse_valid_pr_comment_event(self, shared_tmp: Path, pr_comment_event: dict[str, Any]) -> None:
+        """Тест парсинга валидного события комментария к PR."""
+        event_file = shared_tmp / f"event_{uuid4().hex}.json"
+        event_file.write_text(json.dumps(pr_comment_event))
+
+        with patch.dict(os.environ, {"GITHUB_EVENT_PATH": str(event_file)}):
+            repository, pr_number, comment_body = parse_github_event()
+
+        assert repository == "owner/repo"
+        assert pr_number == 123
+        assert comment_body == "Please @aiissue create an issue for this"
+
+    def test_parse_event_not_pr_comment(
+        self,
+        load_event: Callable[[dict[str, Any]], None],
+        pr_comment_event: dict[str, Any],
+    ) -> None:
+        """Тест парсинга события, которое не является комментарием к PR."""
+        event_data = copy.deepcopy(pr_comment_event)
+        del event_data["issue"]["pull_request"]
+        load_event(event_data)
+
+        with pytest.raises(ValueError, match=NOT_PR_COMMENT_ERROR):
+            parse_github_event()
+
+    def test_parse_event_edited_comment(
+        self,
+        load_event: Callable[[dict[str, Any]], None],
+        pr_comment_event: dict[str, Any],
+    ) -> None:
+        """Тест парсинга события редактирования комментария: триггер в нем не ищется."""
+        load_event({**pr_comment_event, "action": "edited"})
+
+        assert parse_github_event() == ("owner/repo", 123, "")
+
+    @pytest.mark.parametrize(
+        ("env", "message"),
+        [
+            ({}, NO_EVENT_PATH_ERROR),
+            ({"GITHUB_EVENT_PATH": "/nonexistent/path.json"}, EVENT_FILE_NOT_FOUND_ERROR),
+        ],
+        ids=["no_path", "file_not_found"],
+    )
+    @pytest.mark.usefixtures("clean_env")
+    def test_parse_event_errors(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        env: dict[str, str],
+        message: re.Pattern[str],
+    ) -> None:
+        """Тест ошибок, когда путь к файлу события не задан или файла нет."""
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+
+        with pytest.raises(ValueError, match=message):
+            parse_github_event()
+
+
+class TestSetGithubOutput:
+    """Тесты для функций set_github_output и set_github_outputs."""
+
+    def test_set_output_with_github_output_env(self, tmp_path: Path) -> None:
+        """Тест установки output через GITHUB_OUTPUT."""
+        output_file = tmp_path / "output"
+        output_file.touch()
+
+        with patch.dict(os.environ, {"GITHUB_OUTPUT": str(output_file)}):
+            set_github_output("issue_number", "123")
+
+        assert "issue_number=123\n" in output_file.read_text()
+
+    def test_set_outputs_single_write(self, tmp_path: Path) -> None:
+        """Тест записи нескольких outputs в GITHUB_OUTPUT."""
+        output_file = tmp_path / "output"
+        output_file.touch()
+
+        with patch.dict(os.environ, {"GITHUB_OUTPUT": str(output_file)}):
+            set_github_outputs({"issue_number": "123", "issue_url": "https://github.com/owner/repo/issues/123"})
+
+        assert output_file.read_text() == "issue_number=123\nissue_url=https://github.com/owner/repo/issues/123\n"
+
+    @pytest.mark.usefixtures("clean_env")
+    def test_set_output_legacy_method(self) -> None:
+        """Тест установки output через старый метод."""
+        with patch("builtins.print") as mock_print:
+            set_github_output("issue_number", "456")
+
+        mock_print.assert_called_once_with("::set-output name=issue_number::456")
@@ -2,103 +2,156 @@
 Тесты для моделей данных.
 """
 
+from typing import Any
+
 import pytest
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
-from ai_issue.models import IssueContent, PRInfo
+from ai_issue.models import BatchIssueContent, IssueContent, PRInfo
 
+ISSUE_DATA: dict[str, Any] = {
+    "title": "Fix bug in authentication",
+    "body": "This issue addresses authentication problems",
+    "labels": ["bug", "security"],
+    "issue_type": "bug",
+}
 
-class TestIssueContent:
-    """Тесты для модели IssueContent."""
+PR_INFO_DATA: dict[str, Any] = {
+    "title": "Add new feature",
+    "body": "This PR adds a new feature",
+    "assignees": ["user1", "user2"],
+    "author": "author1",
+    "created_at": "2024-01-01T00:00:00",
+    "files_changed": 5,
+    "additions": 100,
+    "deletions": 20,
+}
 
-    def test_valid_issue_content(self) -> None:
-        """Тест создания валидного IssueContent."""
-        issue = IssueContent(
-            title="Fix bug in authentication",
-            body="This issue addresses authentication problems",
-            labels=["bug", "security"],
-            issue_type="bug",
-        )
 
-        assert issue.title == "Fix bug in authentication"
-        assert issue.body == "This issue addresses authentication problems"
-        assert issue.labels == ["bug", "security"]
-        assert issue.issue_type == "bug"
+@pytest.fixture(scope="session")
+def valid_issue() -> IssueContent:
+    """Валидное содержимое issue со всеми полями.
 
-    def test_issue_content_without_optional_fields(self) -> None:
-        """Тест создания IssueContent без опциональных полей."""
-        issue = IssueContent(
-            title="New feature",
-            body="Add new functionality",
-        )
+    Создается один раз за сессию; тесты только читают его, варианты строятся через model_copy.
+    Данные заведомо корректны, поэтому модель собирается без валидации.
+    """
+    return IssueContent.model_construct(**ISSUE_DATA)
 
-        assert issue.title == "New feature"
-        assert issue.body == "Add new functionality"
-        assert issue.labels == []
-        assert issue.issue_type is None
 
-    def test_issue_content_missing_required_fields(self) -> None:
-        """Тест валидации при отсутствии обязательных полей."""
-        with pytest.raises(ValidationError) as exc_info:
-            IssueContent(title="Only title")
+@pytest.fixture(scope="session")
+def valid_pr_info() -> PRInfo:
+    """Валидная информация о PR со всеми полями (модель неизменяема, поэтому общая на сессию).
 
-        errors = exc_info.value.errors()
-        assert len(errors) == 1
-        assert errors[0]["loc"] == ("body",)
-        assert errors[0]["type"] == "missing"
+    Данные заведомо корректны, поэтому модель собирается без валидации.
+    """
+    return PRInfo.model_construct(**PR_INFO_DATA)
 
 
-class TestPRInfo:
-    """Тесты для модели PRInfo."""
+class TestIssueContent:
+    """Тесты для модели IssueContent."""
 
-    def test_valid_pr_info(self) -> None:
-        """Тест создания валидного PRInfo."""
-        pr_info = PRInfo(
-            title="Add new feature",
-            body="This PR adds a new feature",
-            assignees=["user1", "user2"],
-            author="author1",
-            created_at="2024-01-01T00:00:00",
-            files_changed=5,
-            additions=100,
-            deletions=20,
-        )
+    @pytest.mark.parametrize(
+        ("kwargs", "expected"),
+        [
+            (ISSUE_DATA, ISSUE_DATA),
+            (
+                {"title": "New feature", "body": "Add new functionality"},
+                {"title": "New feature", "body": "Add new functionality", "labels": [], "issue_type": None},
+            ),
+        ],
+        ids=["all_fields", "without_optional_fields"],
+    )
+    def test_issue_content_fields(self, kwargs: dict[str, Any], expected: dict[str, Any]) -> None:
+        """Тест создания IssueContent со всеми полями и без опциональных."""
+        issue = IssueContent(**kwargs)
+
+        for name, value in expected.items():
+            assert getattr(issue, name) == value
+
+    def test_issue_content_copy_with_update(self, valid_issue: IssueContent) -> None:
+        """Тест варианта IssueContent через model_copy без изменения исходного."""
+        issue = valid_issue.model_copy(update={"labels": []})
+
+        assert issue.labels == []
+        assert issue.title == valid_issue.title
+        assert valid_issue.labels == ["bug", "security"]
+
+
+class TestBatchIssueContent:
+    """Тесты для модели BatchIssueContent."""
 
-        assert pr_info.title == "Add new feature"
-        assert pr_info.body == "This PR adds a new feature"
-        assert pr_info.assignees == ["user1", "user2"]
-        assert pr_info.author == "author1"
-        assert pr_info.created_at == "2024-01-01T00:00:00"
-        assert pr_info.files_changed == 5
-        assert pr_info.additions == 100
-        assert pr_info.deletions == 20
-
-    def test_pr_info_with_defaults(self) -> None:
-        """Тест создания PRInfo с значениями по умолчанию."""
-        pr_info = PRInfo(
-            title="Quick fix",
-            author="developer",
-            created_at="2024-01-01T00:00:00",
-            files_changed=1,
-            additions=5,
-            deletions=2,
+    def test_parse_batch_from_json(self) -> None:
+        """Тест разбора ответа пакетной генерации."""
+        batch = BatchIssueContent.model_validate_json(
+            '{"items": [{"title": "First", "body": "One"}, {"title": "Second", "body": "Two", "labels": ["bug"]}]}'
         )
 
-        assert pr_info.title == "Quick fix"
-        assert pr_info.body == ""
-        assert pr_info.assignees == []
-        assert pr_info.author == "developer"
+        assert [issue.title for issue in batch.items] == ["First", "Second"]
+        assert batch.items[1].labels == ["bug"]
 
-    def test_pr_info_missing_required_fields(self) -> None:
+
+class TestPRInfo:
+    """Тесты для модели PRInfo."""
+
+    @pytest.mark.parametrize(
+        ("kwargs", "expected"),
+        [
+            (PR_INFO_DATA, PR_INFO_DATA),
+            (
+                {
+                    "title": "Quick fix",
+                    "author": "developer",
+                    "created_at": "2024-01-01T00:00:00",
+                    "files_changed": 1,
+                    "additions": 5,
+                    "deletions": 2,
+                },
+                {"title": "Quick fix", "body": "", "assignees": [], "author": "developer"},
+            ),
+        ],
+        ids=["all_fields", "with_defaults"],
+    )
+    def test_pr_info_fields(self, kwargs: dict[str, Any], expected: dict[str, Any]) -> None:
+        """Тест создания PRInfo со всеми полями и со значениями по умолчанию."""
+        pr_info = PRInfo(**kwargs)
+
+        for name, value in expected.items():
+            assert getattr(pr_info, name) == value
+
+    def test_pr_info_assignees_are_logins(self, valid_pr_info: PRInfo) -> None:
+        """Тест: assignees хранит только логины, а не объекты пользователей."""
+        data = valid_pr_info.model_dump()
+        data["assignees"] = [{"login": "user1"}]
+
+        with pytest.raises(ValidationError):
+            PRInfo.model_validate(data)
+
+    def test_pr_info_is_frozen(self, valid_pr_info: PRInfo) -> None:
+        """Тест неизменяемости PRInfo."""
+        with pytest.raises(ValidationError):
+            valid_pr_info.title = "Changed"
+
+
+class TestRequiredFields:
+    """Тесты валидации обязательных полей моделей."""
+
+    @pytest.mark.parametrize(
+        ("model", "kwargs", "expected"),
+        [
+            (IssueContent, {"title": "Only title"}, {"body"}),
+            (
+                PRInfo,
+                {"title": "Incomplete PR", "author": "dev"},
+                {"created_at", "files_changed", "additions", "deletions"},
+            ),
+        ],
+        ids=["IssueContent", "PRInfo"],
+    )
+    def test_missing_required_fields(self, model: type[BaseModel], kwargs: dict[str, Any], expected: set[str]) -> None:
         """Тест валидации при отсутствии обязательных полей."""
         with pytest.raises(ValidationError) as exc_info:
-            PRInfo(
-                title="Incomplete PR",
-                author="dev",
-            )
+            model(**kwargs)
 
         errors = exc_info.value.errors()
-        assert len(errors) == 4  # created_at, files_changed, additions, deletions
-
-        error_fields = {error["loc"][0] for error in errors}
-        assert error_fields == {"created_at", "files_changed", "additions", "deletions"}
+        assert {error["loc"][0] for error in errors} == expected
+        assert {error["type"] for error in errors} == {"missing"}
@@ -0,0 +1,109 @@
+"""
+Тесты для ограничителя запросов.
+"""
+
+import asyncio
+import time
+from email.utils import formatdate
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from ai_issue.throttle import Throttle, parse_retry_after
+
+
+class TestThrottle:
+    """Тесты для класса Throttle."""
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrent_requests(self) -> None:
+        """Тест ограничения числа одновременных запросов."""
+        throttle = Throttle(max_concurrent=2)
+        active = 0
+        max_active = 0
+
+        async def request() -> None:
+            nonlocal active, max_active
+            async with throttle:
+                active += 1
+                max_active = max(max_active, active)
+                await asyncio.sleep(0)
+                active -= 1
+
+        await asyncio.gather(*(request() for _ in range(6)))
+
+        assert max_active == 2
+
+    @pytest.mark.asyncio
+    async def test_waits_after_retry_after(self) -> None:
+        """Тест паузы перед запросами после заголовка Retry-After."""
+        throttle = Throttle()
+        throttle.update(httpx.Response(429, headers={"Retry-After": "30"}))
+
+        with patch("ai_issue.throttle.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            async with throttle:
+                pass
+
+        assert 29 < mock_sleep.await_args_list[0].args[0] <= 30
+
+    @pytest.mark.asyncio
+    async def test_waits_until_rate_limit_reset(self) -> None:
+        """Тест паузы до сброса исчерпанного лимита запросов."""
+        throttle = Throttle()
+        reset = str(int(time.time()) + 60)
+        throttle.update(httpx.Response(200, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}))
+
+        with patch("ai_issue.throttle.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            async with throttle:
+                pass
+
+        assert 58 < mock_sleep.await_args_list[0].args[0] <= 60
+
+    @pytest.mark.asyncio
+    async def test_no_wait_while_limit_remains(self) -> None:
+        """Тест запросов без паузы, пока лимит не исчерпан."""
+        throttle = Throttle()
+        throttle.update(httpx.Response(200, headers={"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": "0"}))
+
+        with patch("ai_issue.throttle.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            async with throttle:
+                pass
+
+        mock_sleep.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_waits_until_retry_after_date(self) -> None:
+        """Тест паузы до даты из заголовка Retry-After."""
+        throttle = Throttle()
+        throttle.update(httpx.Response(503, headers={"Retry-After": formatdate(time.time() + 60, usegmt=True)}))
+
+        with patch("ai_issue.throttle.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            async with throttle:
+                pass
+
+        assert 58 < mock_sleep.await_args_list[0].args[0] <= 60
+
+    def test_invalid_retry_after_is_ignored(self) -> None:
+        """Тест: нераспознанный Retry-After не роняет запрос и не включает паузу."""
+        throttle = Throttle()
+        throttle.update(httpx.Response(429, headers={"Retry-After": "soon"}))
+
+        assert parse_retry_after("soon") is None
+        assert throttle._resume_at == 0.0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_wait_releases_slot(self) -> None:
+        """Тест: отмена во время паузы освобождает место для следующих запросов."""
+        throttle = Throttle(max_concurrent=1)
+        throttle.update(httpx.Response(429, headers={"Retry-After": "60"}))
+
+        waiting = asyncio.create_task(throttle.__aenter__())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        throttle._resume_at = 0.0
+        async with asyncio.timeout(1), throttle:
+            pass